@@ -10,6 +10,8 @@ test_fval_function = False
 test_anytime_gbfs = False
 test_alternate = True
 test_anytime_weighted_astar = True
+test_concurrent_searches = False
+test_sma_small_budget = False
 
 if test_manhattan:
     ##############################################################
@@ -226,3 +228,100 @@ if test_anytime_weighted_astar:
     print("The benchmark implementation solved 12 out of the 20 practice problems given 8 seconds.")
     print("*************************************\n")
     ##############################################################
+
+if test_concurrent_searches:
+    ##############################################################
+    # TEST CONCURRENT SEARCHES
+    # Each search is run once on its own and then alongside the others in
+    # a thread pool. Searches in separate engines must not disturb each
+    # other, so both runs have to give the same path (with the same state
+    # numbers) and do the same work.
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    print('Testing concurrent searches')
+
+    configs = [('astar', 'full', 'keyed', heur_L_distance, None),
+               ('astar', 'full', 'node', heur_manhattan_distance, None),
+               ('custom', 'full', 'node', heur_alternate, 2.),
+               ('custom', 'full', 'indexed', heur_alternate, 3.),
+               ('best_first', 'full', 'node', heur_alternate, None),
+               ('breadth_first', 'full', 'keyed', heur_trivial, None),
+               ('depth_first', 'full', 'keyed', heur_alternate, None),
+               ('ida_star', 'default', 'keyed', heur_L_distance, None),
+               ('pea_star', 'full', 'keyed', heur_L_distance, None),
+               ('beam', 'full', 'keyed', heur_alternate, None),
+               ('sma_star', 'default', 'keyed', heur_L_distance, None)]
+    problems = [1, 3, 4, 8, 13, 14, 16]
+    jobs = [(i, config) for i in problems for config in configs]
+
+    def run_search(job):
+        i, (strategy, cc_level, frontier, heur_fn, weight) = job
+        se = SearchEngine(strategy, cc_level, frontier)
+        if weight:
+            se.init_search(PROBLEMS[i], lockout_goal_state, heur_fn, (lambda sN: fval_function(sN, weight)))
+        else:
+            se.init_search(PROBLEMS[i], lockout_goal_state, heur_fn)
+        final, stats = se.search(return_stats=True)
+        path = []
+        state = final
+        while state:
+            path.append((state.action, state.index))
+            state = state.parent
+        return stats.solution_cost, stats.expanded, stats.generated, path
+
+    sequential = [run_search(job) for job in jobs]
+    # switch threads often so the searches interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            concurrent = list(pool.map(run_search, jobs + jobs))
+    finally:
+        sys.setswitchinterval(interval)
+
+    mismatched = 0
+    for k, result in enumerate(concurrent):
+        i, config = jobs[k % len(jobs)]
+        if result != sequential[k % len(jobs)]:
+            mismatched = mismatched + 1
+            print("PROBLEM {} {}: cost/expanded/generated {} concurrently, {} sequentially".format(
+                i, config[0], result[:3], sequential[k % len(jobs)][:3]))
+
+    print("\n*************************************")
+    print("{} of {} concurrent searches matched their sequential run.".format(len(concurrent) - mismatched,
+                                                                           len(concurrent)))
+    print("*************************************\n")
+    ##############################################################
+
+if test_sma_small_budget:
+    ##############################################################
+    # TEST SMA STAR WITH A SMALL NODE BUDGET
+    # With memory full sma_star has to keep evicting and regenerating
+    # nodes. It must still find a solution as cheap as astar's (the L
+    # distance is admissible) well within the time bound.
+    print('Testing sma_star with small node budgets')
+
+    timebound = 10
+    cases = [(3, 20), (3, 60), (8, 200), (5, 1000), (13, 20), (14, 20)]
+    passed = 0
+    for i, budget in cases:
+        se = SearchEngine('astar', 'full')
+        se.init_search(PROBLEMS[i], lockout_goal_state, heur_L_distance)
+        expected = se.search(timebound)
+
+        se = SearchEngine('sma_star', 'path')
+        se.set_node_budget(budget)
+        se.init_search(PROBLEMS[i], lockout_goal_state, heur_L_distance)
+        final, stats = se.search(timebound, return_stats=True)
+        if final and expected and final.gval == expected.gval:
+            passed = passed + 1
+        else:
+            print("PROBLEM {} budget {}: cost {} (astar {}), {} expanded, {} evicted".format(
+                i, budget, final.gval if final else None, expected.gval if expected else None,
+                stats.expanded, stats.evicted))
+
+    print("\n*************************************")
+    print("{} of {} small budget sma_star searches found an optimal solution.".format(passed, len(cases)))
+    print("*************************************\n")
+    ##############################################################
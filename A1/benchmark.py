@@ -0,0 +1,281 @@
+'''Benchmark harness for the search engine over the LunarLockout PROBLEMS.
+
+    Runs every (problem x strategy x heuristic x weight) combination as a
+    separate job on a process pool, recording for each job the work done
+    by the SearchEngine (nodes expanded, states generated, states pruned by
+    cycle checking, by the cost bound and as dead positions, stale nodes
+    skipped or, with the indexed frontier, decrease-keys and duplicates
+    dropped on OPEN, heuristic cache hits and misses, peak OPEN and cycle
+    check dictionary sizes, see SearchStats), the peak resident memory of
+    the worker process and the wall and CPU time spent searching.
+
+    Results are written as CSV and/or JSON. A JSON file from an earlier run
+    can be given as a baseline: any job that got slower, used more memory
+    or did more work than the baseline by more than the threshold (or that
+    no longer finds a solution as cheap) is reported as a regression. Jobs
+    are only compared with baseline runs of the same frontier, dead filter
+    and heuristic cache settings, and jobs that hit the time bound in
+    either run only on how many nodes they expand per second.
+
+    Example:
+        python benchmark.py --strategies astar custom --heuristics alternate \\
+            --weights 2 4 --json results.json --baseline baseline.json
+'''
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from search import *
+from lunarlockout import lockout_goal_state, lockout_dead_state
+from solution import heur_trivial, heur_manhattan_distance, heur_L_distance, heur_alternate, fval_function, PROBLEMS
+from patterndb import PatternDatabaseHeuristic, DEFAULT_PDB_PATH
+
+HEURISTICS = {
+    'trivial': heur_trivial,
+    'manhattan': heur_manhattan_distance,
+    'L': heur_L_distance,
+    'alternate': heur_alternate,
+    # needs the file built by python patterndb.py
+    'pdb': PatternDatabaseHeuristic(DEFAULT_PDB_PATH, 'max'),
+}
+
+# weights only change the search for these strategies
+WEIGHTED_STRATEGIES = ('custom', 'ara_star')
+
+FIELDS = ('problem', 'strategy', 'heuristic', 'weight', 'frontier', 'dead_filter', 'heuristic_cache', 'solved',
+          'cost', 'expanded', 'generated', 'cycle_check_pruned', 'cost_bound_pruned', 'stale_pruned', 'decrease_keys',
+          'duplicates_dropped', 'dead_pruned', 'heuristic_cache_hits', 'heuristic_cache_misses', 'peak_open',
+          'peak_cc_dictionary', 'peak_rss_kb', 'wall_time', 'cpu_time')
+
+# the engine settings of a run, with their defaults for baselines that
+# predate them; only jobs run with the same settings are compared
+SETTINGS = (('frontier', 'keyed'), ('dead_filter', False), ('heuristic_cache', None))
+
+# metrics compared against the baseline, where larger is worse
+REGRESSION_METRICS = ('expanded', 'generated', 'peak_open', 'peak_rss_kb', 'wall_time', 'cpu_time')
+TIME_METRICS = ('wall_time', 'cpu_time')
+
+
+def make_jobs(problems, strategies, heuristics, weights):
+    '''Return the list of (problem, strategy, heuristic, weight) jobs.'''
+    jobs = []
+    for problem in problems:
+        for strategy in strategies:
+            for heuristic in heuristics:
+                for weight in (weights if strategy in WEIGHTED_STRATEGIES else (None,)):
+                    jobs.append((problem, strategy, heuristic, weight))
+    return jobs
+
+
+def run_job(job, timebound, dead_filter=False, frontier='keyed', heuristic_cache=None):
+    '''Run a single benchmark job and return its result row. With
+       dead_filter, provably dead successors are dropped as they are generated.
+       frontier is the SearchEngine frontier of the priority queue strategies,
+       and heuristic_cache the capacity of its heuristic cache (None for none).'''
+    problem, strategy, heuristic, weight = job
+    heur_fn = HEURISTICS[heuristic]
+
+    se = SearchEngine(strategy, frontier=frontier)
+    if dead_filter:
+        se.set_successor_filter(lockout_dead_state)
+    se.set_heuristic_cache(heuristic_cache)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if strategy == 'custom':
+            se.init_search(PROBLEMS[problem], lockout_goal_state, heur_fn, (lambda sN: fval_function(sN, weight)))
+        elif strategy == 'ara_star':
+            se.init_search(PROBLEMS[problem], lockout_goal_state, heur_fn, weight=weight)
+        else:
+            se.init_search(PROBLEMS[problem], lockout_goal_state, heur_fn)
+        final, stats = se.search(timebound, return_stats=True)
+
+    peak_rss_kb = None
+    if resource:
+        peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':  # reported in bytes rather than kilobytes
+            peak_rss_kb = peak_rss_kb // 1024
+
+    return {
+        'problem': problem,
+        'strategy': strategy,
+        'heuristic': heuristic,
+        'weight': weight,
+        'frontier': frontier,
+        'dead_filter': dead_filter,
+        'heuristic_cache': heuristic_cache,
+        'solved': stats.solved,
+        'cost': stats.solution_cost,
+        'expanded': stats.expanded,
+        'generated': stats.generated,
+        'cycle_check_pruned': stats.cycle_check_pruned,
+        'cost_bound_pruned': stats.cost_bound_pruned,
+        'stale_pruned': stats.stale_pruned,
+        'decrease_keys': stats.decrease_keys,
+        'duplicates_dropped': stats.duplicates_dropped,
+        'dead_pruned': stats.dead_pruned,
+        'heuristic_cache_hits': stats.heuristic_cache_hits,
+        'heuristic_cache_misses': stats.heuristic_cache_misses,
+        'peak_open': stats.peak_open,
+        'peak_cc_dictionary': stats.peak_cc_dictionary,
+        'peak_rss_kb': peak_rss_kb,
+        'wall_time': round(stats.wall_time, 4),
+        'cpu_time': round(stats.cpu_time, 4),
+    }
+
+
+def _run_job(args):
+    return run_job(*args)
+
+
+def run_benchmark(jobs, timebound=2, processes=None, dead_filter=False, frontier='keyed', heuristic_cache=None):
+    '''Run the jobs on a process pool, returning their result rows in job
+       order. Each worker process runs a single job so that its peak RSS
+       belongs to that job alone.'''
+    with multiprocessing.Pool(processes, maxtasksperchild=1) as pool:
+        return pool.map(_run_job, [(job, timebound, dead_filter, frontier, heuristic_cache) for job in jobs],
+                        chunksize=1)
+
+
+def write_csv(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(rows, path):
+    with open(path, 'w') as f:
+        json.dump(rows, f, indent=1)
+
+
+def job_key(row):
+    '''Return the key matching a result row to the baseline row of the
+       same job run with the same SETTINGS.'''
+    return ((row['problem'], row['strategy'], row['heuristic'], row['weight']) +
+            tuple(row.get(setting, default) for setting, default in SETTINGS))
+
+
+def find_regressions(rows, baseline_rows, threshold=0.1, min_time=0.05):
+    '''Compare rows against baseline_rows, matching jobs by job_key, so
+       a job is only compared with a baseline run of the same problem,
+       strategy, heuristic and weight with the same SETTINGS. Returns a list of (row, metric,
+       baseline value, new value) for each metric that is worse than the
+       baseline by more than the threshold fraction, including jobs that
+       are no longer solved or whose solution got more expensive. Times
+       below min_time seconds are too noisy to compare and are ignored.
+
+       A job that is unsolved in either run stopped at its time bound, so
+       its work and times measure the time bound rather than the search.
+       For such jobs only the search rate is compared: nodes expanded per
+       second of wall time, reported as 'expanded_per_sec' if it fell by
+       more than the threshold fraction.'''
+    baseline = dict((job_key(row), row) for row in baseline_rows)
+    regressions = []
+    for row in rows:
+        base = baseline.get(job_key(row))
+        if base is None:
+            continue
+        if base['solved'] and not row['solved']:
+            regressions.append((row, 'solved', True, False))
+            continue
+        if base['solved'] and row['cost'] > base['cost']:
+            regressions.append((row, 'cost', base['cost'], row['cost']))
+        if not (base['solved'] and row['solved']):
+            if base['wall_time'] >= min_time and row['wall_time'] >= min_time:
+                base_rate = base['expanded'] / base['wall_time']
+                rate = row['expanded'] / row['wall_time']
+                if rate * (1 + threshold) < base_rate:
+                    regressions.append((row, 'expanded_per_sec', round(base_rate, 1), round(rate, 1)))
+            continue
+        for metric in REGRESSION_METRICS:
+            if base[metric] is None or row[metric] is None:
+                continue
+            if metric in TIME_METRICS and row[metric] < min_time:
+                continue
+            if row[metric] > base[metric] * (1 + threshold):
+                regressions.append((row, metric, base[metric], row[metric]))
+    return regressions
+
+
+def _parse_problems(spec):
+    '''Parse a problem list such as "0-12,15" into a list of indices.'''
+    problems = []
+    for part in spec.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            problems.extend(range(int(first), int(last) + 1))
+        else:
+            problems.append(int(part))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the search engine on the LunarLockout PROBLEMS.')
+    parser.add_argument('--problems', default='0-{}'.format(len(PROBLEMS) - 1),
+                        help='problem indices, e.g. "0-12,15" (default: all)')
+    parser.add_argument('--strategies', nargs='+', default=['astar', 'best_first', 'custom'])
+    parser.add_argument('--heuristics', nargs='+', default=['alternate'], choices=sorted(HEURISTICS))
+    parser.add_argument('--weights', nargs='+', type=float, default=[2., 4.],
+                        help='weights for the custom and ara_star strategies')
+    parser.add_argument('--timebound', type=float, default=2, help='seconds per job')
+    parser.add_argument('--dead-filter', action='store_true',
+                        help='drop provably dead successors as they are generated')
+    parser.add_argument('--frontier', default='keyed', choices=['keyed', 'node', 'indexed'],
+                        help='OPEN of the priority queue strategies (default: keyed)')
+    parser.add_argument('--heuristic-cache', type=int, default=None,
+                        help='memoise up to this many heuristic values per job (default: no cache)')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--csv', help='write results to this CSV file')
+    parser.add_argument('--json', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='fraction by which a metric may exceed the baseline (default: 0.1)')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='ignore wall and CPU times below this many seconds (default: 0.05)')
+    args = parser.parse_args(argv)
+
+    if 'pdb' in args.heuristics and not os.path.exists(DEFAULT_PDB_PATH):
+        print("No pattern database {}, build it with python patterndb.py".format(DEFAULT_PDB_PATH))
+        return 1
+
+    jobs = make_jobs(_parse_problems(args.problems), args.strategies, args.heuristics, args.weights)
+    print("Running {} benchmark jobs".format(len(jobs)))
+    rows = run_benchmark(jobs, args.timebound, args.processes, args.dead_filter, args.frontier,
+                         args.heuristic_cache)
+
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.json:
+        write_json(rows, args.json)
+    print("{} of {} jobs solved".format(sum(row['solved'] for row in rows), len(rows)))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline_rows = json.load(f)
+        baseline_keys = set(job_key(row) for row in baseline_rows)
+        unmatched = sum(job_key(row) not in baseline_keys for row in rows)
+        if unmatched:
+            print("{} jobs have no baseline run with the same {} and were not compared".format(
+                unmatched, ", ".join(setting for setting, _ in SETTINGS)))
+        regressions = find_regressions(rows, baseline_rows, args.threshold, args.min_time)
+        for row, metric, old, new in regressions:
+            print("REGRESSION: problem {} {} {} weight {}: {} {} -> {}".format(
+                row['problem'], row['strategy'], row['heuristic'], row['weight'], metric, old, new))
+        print("{} regressions against {}".format(len(regressions), args.baseline))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+'''External memory breadth-first search for LunarLockout.
+
+    A) external_bfs
+
+    Explores every state reachable from a LunarLockoutState one depth layer
+    at a time, keeping the layers on disk instead of in a cycle check
+    dictionary, so that the number of states covered is bounded by disk
+    space rather than by RAM. It returns the number of states at each
+    depth (the distance distribution of the whole state space) and the
+    depth of the first goal layer, or None if no goal is reachable, which
+    proves the problem unsolvable.
+
+    Each layer is a file of fixed width state records in sorted order.
+    The next layer is made by streaming the current layer back in batches
+    and expanding it. Successor records are collected in memory up to
+    batch_size at a time, then sorted and written out as a run file. Once
+    the layer is expanded the runs are merged (heapq.merge), removing
+    duplicates, and any record found in the earlier layers is dropped by
+    merging against their files.
+
+    The search only ever holds one batch of records in memory, plus one
+    buffered record per open file during a merge.
+
+    B) LunarLockoutCodec
+
+    Encodes a board as one byte per piece: the sorted robot cells followed
+    by the sorted xanadu cells (cells are numbered y * size + x, so boards
+    up to 15 x 15 fit). Robots, like xanadus, are interchangeable, so
+    boards that differ only by a relabelling of the pieces share a record.
+    With symmetry=True the record is also the smallest over the eight
+    rotations and reflections of the board, which shrinks the layers by up
+    to a factor of eight without changing any distance.
+
+    Duplicate detection against the previous layers
+
+    In an undirected state space every successor of layer d is in layer
+    d - 1, d or d + 1, so merging against the previous two layers is
+    enough. LunarLockout moves can not always be undone (a piece slides
+    until it is stopped), so a state can also reappear further back, and a
+    cycle of moves would keep it reappearing for ever. external_bfs merges
+    against every earlier layer by default; dedup_layers=2 gives the
+    cheaper undirected variant.
+
+    Example:
+        python externalbfs.py --problem 3 --symmetry --batch-size 1000000
+'''
+
+import argparse
+import heapq
+import os
+import shutil
+import tempfile
+import time
+
+from search import *
+from lunarbitboard import BitboardLunarLockoutState, to_bitboard, bitboard_goal_state, _cell_symmetries
+
+# records read from a file at a time
+_READ_RECORDS = 65536
+
+
+class LunarLockoutCodec:
+    '''Fixed width byte records for the boards reachable from a
+       LunarLockoutState, see the module docstring.'''
+
+    def __init__(self, state, symmetry=False):
+        '''
+        @param state: a LunarLockoutState or BitboardLunarLockoutState giving the board size and pieces.
+        @param symmetry: if True, boards equal up to a rotation or reflection share a record.
+        '''
+        if not isinstance(state, BitboardLunarLockoutState):
+            state = to_bitboard(state)
+        self.size = state.size
+        self.robots = len(state.robot_cells)
+        self.xanadus = len(state.xanadu_cells)
+        self.width = self.robots + self.xanadus
+        self.symmetry = symmetry
+        self.symmetries = _cell_symmetries(self.size) if symmetry else None
+        if self.size * self.size > 256:
+            print("Boards larger than 15 x 15 can not be encoded in one byte per cell")
+
+    def encode(self, state):
+        '''Return the record of a BitboardLunarLockoutState.'''
+        robots = state.robot_cells
+        xanadus = state.xanadu_cells
+        if self.symmetries is None:
+            return bytes(sorted(robots) + sorted(xanadus))
+        return min(bytes(sorted([m[cell] for cell in robots]) + sorted([m[cell] for cell in xanadus]))
+                   for m in self.symmetries)
+
+    def decode(self, record):
+        '''Return a BitboardLunarLockoutState for a record.'''
+        return BitboardLunarLockoutState(None, 0, None, self.size, tuple(record[:self.robots]),
+                                         tuple(record[self.robots:]))
+
+
+def _write_records(path, records):
+    '''Write an iterable of records to path, returning how many there were.'''
+    count = 0
+    with open(path, 'wb') as f:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= _READ_RECORDS:
+                f.write(b''.join(batch))
+                count = count + len(batch)
+                batch = []
+        f.write(b''.join(batch))
+        count = count + len(batch)
+    return count
+
+
+def _read_records(path, width):
+    '''Generate the records of a file written by _write_records.'''
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(width * _READ_RECORDS)
+            if not chunk:
+                return
+            for i in range(0, len(chunk), width):
+                yield chunk[i:i + width]
+
+
+def _unique(records):
+    '''Drop consecutive duplicates from a sorted stream of records.'''
+    last = None
+    for record in records:
+        if record != last:
+            yield record
+            last = record
+
+
+def _difference(records, seen):
+    '''Generate the records of a sorted stream that are not in the sorted stream seen.'''
+    seen = iter(seen)
+    other = next(seen, None)
+    for record in records:
+        while other is not None and other < record:
+            other = next(seen, None)
+        if record != other:
+            yield record
+
+
+def external_bfs(initial_state, goal_fn=bitboard_goal_state, symmetry=False, batch_size=1000000,
+                 dedup_layers=None, work_dir=None, keep_files=False, stop_at_goal=False, trace=False):
+    '''
+    Breadth-first search of every state reachable from initial_state with the layers kept on disk, see the
+    module docstring.
+
+    @param initial_state: a LunarLockoutState or BitboardLunarLockoutState.
+    @param goal_fn: a goal function taking a BitboardLunarLockoutState.
+    @param symmetry: if True, states equal up to a rotation or reflection of the board are merged.
+    @param batch_size: the number of successor records held in memory before a run is written to disk.
+    @param dedup_layers: how many previous layers to remove duplicates against, None for all of them.
+    @param work_dir: the directory for the layer and run files (default: a new temporary directory).
+    @param keep_files: if True, the layer files (layer_0000.bin, ...) are left in work_dir.
+    @param stop_at_goal: if True, stop after the first layer that holds a goal.
+    @param trace: if True, print the size of each layer as it is completed.
+    @return: a dictionary with the number of states in each layer ('layers'), the number of goal states in each
+             layer ('goals'), the depth of the first goal or None ('goal_depth'), the total number of states
+             ('states'), the record width in bytes ('record_width') and the time taken ('wall_time').
+    '''
+    start = time.monotonic()
+    codec = LunarLockoutCodec(initial_state, symmetry)
+    width = codec.width
+    if not isinstance(initial_state, BitboardLunarLockoutState):
+        initial_state = to_bitboard(initial_state)
+
+    made_dir = work_dir is None
+    if made_dir:
+        work_dir = tempfile.mkdtemp(prefix='externalbfs')
+    layer_paths = []
+    layers = []
+    goals = []
+    goal_depth = None
+
+    try:
+        path = os.path.join(work_dir, 'layer_0000.bin')
+        _write_records(path, [codec.encode(initial_state)])
+        layer_paths.append(path)
+        layers.append(1)
+
+        while True:
+            depth = len(layers) - 1
+
+            # count the goals on the completed layer
+            goal_count = 0
+            for record in _read_records(layer_paths[depth], width):
+                if goal_fn(codec.decode(record)):
+                    goal_count = goal_count + 1
+            goals.append(goal_count)
+            if goal_count and goal_depth is None:
+                goal_depth = depth
+
+            # BEGIN TRACING
+            if trace:
+                print("   TRACE: layer {}: {} states, {} goals, {:.2f} sec".format(
+                    depth, layers[depth], goal_count, time.monotonic() - start))
+            # END TRACING
+
+            if goal_count and stop_at_goal:
+                break
+
+            # expand the layer into sorted runs of successor records
+            runs = []
+            batch = set()
+            for record in _read_records(layer_paths[depth], width):
+                state = codec.decode(record)
+                if goal_fn(state):
+                    continue
+                for succ in state.successors():
+                    batch.add(codec.encode(succ))
+                if len(batch) >= batch_size:
+                    runs.append(os.path.join(work_dir, 'run_{:04d}_{:04d}.bin'.format(depth + 1, len(runs))))
+                    _write_records(runs[-1], sorted(batch))
+                    batch = set()
+            if batch or not runs:
+                runs.append(os.path.join(work_dir, 'run_{:04d}_{:04d}.bin'.format(depth + 1, len(runs))))
+                _write_records(runs[-1], sorted(batch))
+                batch = None
+
+            # merge the runs and drop the records already in the earlier layers
+            previous = layer_paths if dedup_layers is None else layer_paths[-dedup_layers:]
+            records = _unique(heapq.merge(*[_read_records(run, width) for run in runs]))
+            records = _difference(records, heapq.merge(*[_read_records(p, width) for p in previous]))
+            path = os.path.join(work_dir, 'layer_{:04d}.bin'.format(depth + 1))
+            count = _write_records(path, records)
+            for run in runs:
+                os.remove(run)
+            if not count:
+                os.remove(path)
+                break
+            layer_paths.append(path)
+            layers.append(count)
+    finally:
+        if not keep_files:
+            for path in layer_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            if made_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'layers': layers,
+        'goals': goals,
+        'goal_depth': goal_depth,
+        'states': sum(layers),
+        'record_width': width,
+        'wall_time': time.monotonic() - start,
+    }
+
+
+if __name__ == "__main__":
+    from solution import PROBLEMS
+
+    parser = argparse.ArgumentParser(description='External memory breadth-first search of a LunarLockout problem.')
+    parser.add_argument('--problem', type=int, default=0, help='index of the problem in PROBLEMS')
+    parser.add_argument('--symmetry', action='store_true', help='merge boards equal up to a rotation or reflection')
+    parser.add_argument('--batch-size', type=int, default=1000000, help='successor records held in memory')
+    parser.add_argument('--dedup-layers', type=int, default=None,
+                        help='previous layers to remove duplicates against (default: all)')
+    parser.add_argument('--work-dir', default=None, help='directory for the layer files (default: a temporary one)')
+    parser.add_argument('--keep-files', action='store_true', help='leave the layer files in the work directory')
+    parser.add_argument('--stop-at-goal', action='store_true', help='stop after the first goal layer')
+    args = parser.parse_args()
+
+    result = external_bfs(PROBLEMS[args.problem], symmetry=args.symmetry, batch_size=args.batch_size,
+                          dedup_layers=args.dedup_layers, work_dir=args.work_dir, keep_files=args.keep_files,
+                          stop_at_goal=args.stop_at_goal, trace=True)
+    print("PROBLEM {}: {} states in {} layers, {}-byte records, {:.2f} sec".format(
+        args.problem, result['states'], len(result['layers']), result['record_width'], result['wall_time']))
+    if result['goal_depth'] is None:
+        print("No goal is reachable: the problem is unsolvable")
+    else:
+        print("The first goal is at depth {}".format(result['goal_depth']))
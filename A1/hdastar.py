@@ -0,0 +1,296 @@
+'''Hash distributed A* (HDA*).
+
+    A single SearchEngine runs on one core. hda_star runs one A* search
+    split over several worker processes: every state is owned by one
+    worker, chosen by a hash (crc32) of the repr of its hashable_state(),
+    and only its owner keeps it on OPEN, computes its heuristic value,
+    checks it for duplicates and expands it. Successors owned by another
+    worker are sent to it in batches of up to batch_size states, one
+    multiprocessing queue per worker.
+
+    States are sent without their parent (which would pickle the whole
+    path to them); each carries the actions that reached it instead, and
+    the solution path is rebuilt at the end by replaying those actions
+    from the initial state. Any picklable StateSpace subclass can be
+    searched, given module level (picklable) goal and heuristic functions.
+
+    Optimality. The cost of the best solution found so far (the
+    incumbent) is shared by the workers, which never expand, or keep on
+    OPEN, a node whose f = g + h is not below it. With an admissible
+    heuristic the incumbent is optimal once no worker has a node left to
+    expand and no batch of states is in transit.
+
+    Termination. Each worker raises its idle flag when it has nothing to
+    expand and has sent all of its batches, and lowers it as soon as it
+    receives a batch. Batches are counted when sent, before they are
+    queued, and when received, after they are put on OPEN. The main
+    process stops the workers once it sees every flag raised and the two
+    counts equal, twice in a row with no count changing in between.
+'''
+
+import heapq
+import multiprocessing
+import queue
+import time
+import zlib
+
+from search import *
+
+# Messages sent by the workers on the results queue are tuples of
+# (kind, worker, value).
+_SOLUTION = 0
+_DONE = 1
+
+# how long an idle worker, and the main process, wait for a message
+_POLL = 0.01
+
+
+def _owner(state, workers):
+    '''Return the worker that owns state. The hash must be the same in
+       every process, so Python's (randomised) hash() is not used.'''
+    return zlib.crc32(repr(state.hashable_state()).encode()) % workers
+
+
+def replay(initial_state, actions):
+    '''Return the state reached from initial_state by the given actions
+       (with its parent chain), or None if an action is not available.'''
+    state = initial_state
+    for action in actions:
+        for succ in state.successors():
+            if succ.action == action:
+                state = succ
+                break
+        else:
+            return None
+    return state
+
+
+def _hda_worker(me, goal_fn, heur_fn, inboxes, results, incumbent, idle, sent, received, stop, batch_size):
+    '''Run the A* search over the states owned by worker me.'''
+    workers = len(inboxes)
+    inbox = inboxes[me]
+    # OPEN entries are (f, h, insertion count, g, state, actions), and
+    # best holds the cheapest g-value seen for each owned state.
+    open_heap = []
+    best = dict()
+    outboxes = [[] for _ in range(workers)]
+    inserted = 0
+    stats = {'expanded': 0, 'generated': 0, 'duplicates': 0, 'cost_bound_pruned': 0, 'peak_open': 0,
+             'batches_sent': 0}
+
+    def insert(gval, state, actions, bound):
+        nonlocal inserted
+        key = state.hashable_state()
+        if gval >= best.get(key, float("inf")):
+            stats['duplicates'] = stats['duplicates'] + 1
+            return
+        hval = heur_fn(state)
+        if gval + hval >= bound:
+            stats['cost_bound_pruned'] = stats['cost_bound_pruned'] + 1
+            return
+        best[key] = gval
+        inserted = inserted + 1
+        heapq.heappush(open_heap, (gval + hval, hval, inserted, gval, state, actions))
+
+    def flush(owner):
+        with sent.get_lock():
+            sent.value = sent.value + 1
+        inboxes[owner].put(outboxes[owner])
+        outboxes[owner] = []
+        stats['batches_sent'] = stats['batches_sent'] + 1
+
+    while not stop.is_set():
+        # take in the batches sent to this worker
+        can_expand = open_heap and open_heap[0][0] < incumbent.value
+        try:
+            batch = inbox.get_nowait() if can_expand else inbox.get(timeout=_POLL)
+        except queue.Empty:
+            batch = None
+        if batch is not None:
+            idle[me] = 0
+            bound = incumbent.value
+            for gval, state, actions in batch:
+                insert(gval, state, actions, bound)
+            if len(open_heap) > stats['peak_open']:
+                stats['peak_open'] = len(open_heap)
+            with received.get_lock():
+                received.value = received.value + 1
+            continue
+
+        if not open_heap or open_heap[0][0] >= incumbent.value:
+            # nothing to expand: send what is left and go idle
+            for owner in range(workers):
+                if outboxes[owner]:
+                    flush(owner)
+            open_heap.clear()
+            idle[me] = 1
+            continue
+
+        fval, hval, _, gval, state, actions = heapq.heappop(open_heap)
+        if gval > best[state.hashable_state()]:
+            # reached again more cheaply since it was put on OPEN
+            stats['duplicates'] = stats['duplicates'] + 1
+            continue
+
+        if goal_fn(state):
+            with incumbent.get_lock():
+                if gval < incumbent.value:
+                    incumbent.value = gval
+                    results.put((_SOLUTION, me, (gval, actions)))
+            continue
+
+        successors = state.successors()
+        stats['expanded'] = stats['expanded'] + 1
+        stats['generated'] = stats['generated'] + len(successors)
+        bound = incumbent.value
+        for succ in successors:
+            owner = _owner(succ, workers)
+            succ_actions = actions + (succ.action,)
+            succ.parent = None
+            if owner == me:
+                insert(succ.gval, succ, succ_actions, bound)
+                continue
+            outboxes[owner].append((succ.gval, succ, succ_actions))
+            if len(outboxes[owner]) >= batch_size:
+                flush(owner)
+        if len(open_heap) > stats['peak_open']:
+            stats['peak_open'] = len(open_heap)
+        if stats['expanded'] % batch_size == 0:
+            # don't let a part filled batch wait behind a long run of
+            # local expansions
+            for owner in range(workers):
+                if outboxes[owner]:
+                    flush(owner)
+
+    results.put((_DONE, me, stats))
+    # states still queued for stopped workers must not keep this process alive
+    for box in inboxes:
+        box.cancel_join_thread()
+
+
+def _terminated(idle, sent, received):
+    '''Return True if every worker is idle and no batch is in transit, see the module docstring.'''
+    if not all(idle[:]):
+        return False
+    counts = (sent.value, received.value)
+    if counts[0] != counts[1]:
+        return False
+    time.sleep(_POLL)
+    return all(idle[:]) and (sent.value, received.value) == counts
+
+
+def hda_star(initial_state, goal_fn, heur_fn, workers=None, timebound=None, batch_size=64, return_stats=False):
+    '''
+    Search for an optimal path from initial_state to a goal with A*, distributed over worker processes by a hash
+    of the states, see the module docstring.
+
+    @param initial_state: the initial state, an instance of a picklable StateSpace subclass.
+    @param goal_fn: the goal function, defined at module level.
+    @param heur_fn: an admissible heuristic function, defined at module level.
+    @param workers: the number of worker processes (default: the CPU count).
+    @param timebound: the maximum number of seconds to search, or None; when it expires the best solution found so
+                      far, which need not be optimal, is returned.
+    @param batch_size: the most states sent to another worker in one message.
+    @param return_stats: if True return a (goal state or False, SearchStats) pair.
+    @return: the goal state (with its path), or False if there is no solution or none was found in time.
+    '''
+    start = time.monotonic()
+    start_cpu = time.process_time()
+    workers = workers or multiprocessing.cpu_count()
+    ctx = multiprocessing.get_context()
+    inboxes = [ctx.Queue() for _ in range(workers)]
+    results = ctx.Queue()
+    incumbent = ctx.Value('d', float("inf"))
+    idle = ctx.Array('b', workers)
+    sent = ctx.Value('q', 0)
+    received = ctx.Value('q', 0)
+    stop = ctx.Event()
+    processes = [ctx.Process(target=_hda_worker, daemon=True,
+                             args=(me, goal_fn, heur_fn, inboxes, results, incumbent, idle, sent, received, stop,
+                                   batch_size))
+                 for me in range(workers)]
+    for process in processes:
+        process.start()
+
+    with sent.get_lock():
+        sent.value = sent.value + 1
+    inboxes[_owner(initial_state, workers)].put([(initial_state.gval, initial_state, ())])
+
+    best = None
+    worker_stats = []
+    try:
+        while True:
+            try:
+                kind, _, value = results.get(timeout=_POLL)
+                if kind == _SOLUTION and (best is None or value[0] < best[0]):
+                    best = value
+                continue
+            except queue.Empty:
+                pass
+            if _terminated(idle, sent, received):
+                break
+            if timebound is not None and time.monotonic() - start > timebound:
+                print("TRACE: Search has exceeeded the time bound provided.")
+                break
+    finally:
+        stop.set()
+        deadline = time.monotonic() + 1
+        while len(worker_stats) < workers and time.monotonic() < deadline:
+            try:
+                kind, _, value = results.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+            if kind == _SOLUTION and (best is None or value[0] < best[0]):
+                best = value
+            elif kind == _DONE:
+                worker_stats.append(value)
+        for process in processes:
+            process.join(0.5)
+            if process.is_alive():
+                process.terminate()
+        for box in inboxes:
+            box.cancel_join_thread()
+
+    result = False
+    if best is not None:
+        result = replay(initial_state, best[1])
+        if result is None:
+            print("The solution found can not be replayed from the initial state")
+            result = False
+
+    if return_stats:
+        stats = SearchStats()
+        stats.strategy = 'hda_star'
+        stats.solved = bool(result)
+        stats.solution_cost = result.gval if result else None
+        stats.expanded = sum(s['expanded'] for s in worker_stats)
+        stats.generated = sum(s['generated'] for s in worker_stats)
+        stats.cycle_check_pruned = sum(s['duplicates'] for s in worker_stats)
+        stats.cost_bound_pruned = sum(s['cost_bound_pruned'] for s in worker_stats)
+        stats.peak_open = sum(s['peak_open'] for s in worker_stats)
+        stats.wall_time = time.monotonic() - start
+        # the main process only waits for the workers
+        stats.cpu_time = time.process_time() - start_cpu
+        return result, stats
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    from lunarlockout import lockout_goal_state
+    from solution import heur_L_distance, PROBLEMS
+
+    parser = argparse.ArgumentParser(description='Hash distributed A* on the LunarLockout PROBLEMS.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--timebound', type=float, default=10, help='seconds per problem')
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    for i in range(len(PROBLEMS)):
+        row = []
+        for workers in args.workers:
+            final, stats = hda_star(PROBLEMS[i], lockout_goal_state, heur_L_distance, workers, args.timebound,
+                                    args.batch_size, return_stats=True)
+            row.append("{} workers: cost {} expanded {} ({:.0f}/sec)".format(
+                workers, stats.solution_cost, stats.expanded, stats.expanded / max(stats.wall_time, 1e-9)))
+        print("PROBLEM {}: {}".format(i, ", ".join(row)))
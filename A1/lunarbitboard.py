@@ -0,0 +1,250 @@
+'''Bitboard Lunar Lockout routines.
+
+    A) Class BitboardLunarLockoutState
+
+    An alternative LunarLockout state representation. Each robot and
+    xanadu position is stored as a cell number, y * size + x, and the
+    pieces that can stop a moving piece are packed into one integer
+    occupancy mask. For every cell and direction a precomputed slide table
+    holds the mask of the cells in that direction, so the piece that stops
+    a slide is found with a single bit scan instead of by searching the
+    other pieces.
+
+    The successors, their order and their action names are the same as
+    those of LunarLockoutState, and the robots, xanadus, width and height
+    attributes are available (as coordinates) so the LunarLockout goal and
+    heuristic functions can be used unchanged.
+
+    B) Conversion functions to_bitboard and from_bitboard, and the goal
+    function bitboard_goal_state and dead position test bitboard_dead_state
+    which work on cell numbers directly.
+'''
+
+from search import *
+from lunarlockout import LunarLockoutState, UP, RIGHT, DOWN, LEFT, _symmetries, _dead_table, _dead_bits
+
+_DIRECTIONS = (UP, RIGHT, DOWN, LEFT)
+
+# Slide tables by board size, see _slide_table.
+_SLIDE_TABLES = dict()
+
+# Board symmetries as cell permutations by board size, see _cell_symmetries.
+_CELL_SYMMETRIES = dict()
+
+# Dead position tables by cell, by board size, see _cell_dead_table.
+_CELL_DEAD_TABLES = dict()
+
+
+def _slide_table(size):
+    '''Return the slide table for a board of the given size. The entry for
+       a cell is a tuple, in the order UP, RIGHT, DOWN, LEFT, of (direction
+       index, ray mask, cell step, ray runs to increasing cells) for each
+       direction in which the cell is not on the edge of the board. The ray
+       mask has a bit set for each cell from the cell (exclusive) to the
+       edge of the board in that direction.'''
+    table = _SLIDE_TABLES.get(size)
+    if table is None:
+        table = []
+        for cell in range(size * size):
+            x, y = cell % size, cell // size
+            rays = []
+            for d, direction in enumerate(_DIRECTIONS):
+                dx, dy = direction.delta
+                ray = 0
+                rx, ry = x + dx, y + dy
+                while 0 <= rx < size and 0 <= ry < size:
+                    ray |= 1 << (ry * size + rx)
+                    rx, ry = rx + dx, ry + dy
+                if ray:
+                    step = dy * size + dx
+                    rays.append((d, ray, step, step > 0))
+            table.append(tuple(rays))
+        _SLIDE_TABLES[size] = table
+    return table
+
+
+def _cell_symmetries(size):
+    '''Return the eight symmetries of a board of the given size as tuples
+       mapping each cell to its image.'''
+    table = _CELL_SYMMETRIES.get(size)
+    if table is None:
+        table = []
+        for m in _symmetries(size):
+            image = [0] * (size * size)
+            for (x, y), (mx, my) in m.items():
+                image[y * size + x] = my * size + mx
+            table.append(tuple(image))
+        _CELL_SYMMETRIES[size] = table
+    return table
+
+
+def _cell_dead_table(size):
+    '''Return the lunarlockout dead position table of a board of the
+       given size as a tuple indexed by cell.'''
+    table = _CELL_DEAD_TABLES.get(size)
+    if table is None:
+        by_location = _dead_table(size)
+        table = tuple(by_location[(cell % size, cell // size)] for cell in range(size * size))
+        _CELL_DEAD_TABLES[size] = table
+    return table
+
+
+class BitboardLunarLockoutState(StateSpace):
+    __slots__ = ('size', 'robot_cells', 'xanadu_cells')
+
+    def __init__(self, action, gval, parent, size, robot_cells, xanadu_cells):
+        '''
+        Creates a new BitboardLunarLockoutState state.
+        @param size: The board's X and Y dimension (excluding walls), must be odd.
+        @param robot_cells: A tuple of the robots' cells (y * size + x).
+        @param xanadu_cells: A tuple of the xanadus' cells (y * size + x).
+        '''
+        StateSpace.__init__(self, action, gval, parent)
+        self.size = size
+        self.robot_cells = robot_cells
+        self.xanadu_cells = xanadu_cells
+
+    # actions are stored as lunarlockout action codes
+    action = LunarLockoutState.action
+    action_code = LunarLockoutState.action_code
+
+    @property
+    def width(self):
+        return self.size
+
+    @property
+    def height(self):
+        return self.size
+
+    @property
+    def robots(self):
+        size = self.size
+        return tuple((cell % size, cell // size) for cell in self.robot_cells)
+
+    @property
+    def xanadus(self):
+        size = self.size
+        return tuple((cell % size, cell // size) for cell in self.xanadu_cells)
+
+    def getRobots(self):
+        return self.robots
+
+    def successors(self):
+        '''
+        Generates all the actions that can be performed from this state, and the states those actions will create.
+        '''
+        successors = []
+        size = self.size
+        table = _slide_table(size)
+        center = (size * size) // 2
+        robots = self.robot_cells
+        xanadus = self.xanadu_cells
+        gval = self.gval + 1
+
+        # xanadus that have reached the center no longer stop other pieces
+        occupied = 0
+        for cell in robots:
+            occupied |= 1 << cell
+        for cell in xanadus:
+            if cell != center:
+                occupied |= 1 << cell
+
+        for i, cell in enumerate(robots):
+            others = occupied & ~(1 << cell)
+            action = i * 8
+            for d, ray, step, increasing in table[cell]:
+                blockers = others & ray
+                if not blockers:
+                    continue
+                if increasing:
+                    new_cell = (blockers & -blockers).bit_length() - 1 - step
+                else:
+                    new_cell = blockers.bit_length() - 1 - step
+                if new_cell == cell:
+                    continue
+                successors.append(BitboardLunarLockoutState(action + d, gval, self, size,
+                                                            robots[:i] + (new_cell,) + robots[i + 1:], xanadus))
+
+        for i, cell in enumerate(xanadus):
+            if cell == center:
+                continue
+            others = occupied & ~(1 << cell)
+            action = i * 8 + 4
+            for d, ray, step, increasing in table[cell]:
+                blockers = others & ray
+                if not blockers:
+                    continue
+                if increasing:
+                    new_cell = (blockers & -blockers).bit_length() - 1 - step
+                else:
+                    new_cell = blockers.bit_length() - 1 - step
+                if new_cell == cell:
+                    continue
+                successors.append(BitboardLunarLockoutState(action + d, gval, self, size, robots,
+                                                            xanadus[:i] + (new_cell,) + xanadus[i + 1:]))
+
+        return successors
+
+    def hashable_state(self):
+        '''Return a data item that can be used as a dictionary key to UNIQUELY represent a state.'''
+        return (self.robot_cells, self.xanadu_cells)
+
+    def canonical_state(self):
+        '''
+        Return a data item shared by all states that are the same as this one up to a rotation or reflection
+        of the board and a relabelling of the robots (and of the xanadus).
+        '''
+        robots = self.robot_cells
+        xanadus = self.xanadu_cells
+        return min((tuple(sorted([m[cell] for cell in xanadus])), tuple(sorted([m[cell] for cell in robots])))
+                   for m in _cell_symmetries(self.size))
+
+    # the board is drawn from the robots and xanadus coordinates
+    state_string = LunarLockoutState.state_string
+    print_state = LunarLockoutState.print_state
+
+
+def to_bitboard(state):
+    '''Returns the BitboardLunarLockoutState equivalent to a LunarLockoutState.
+       A single xanadu given as an (x, y) pair is treated as a one xanadu tuple.'''
+    size = state.width
+    xanadus = state.xanadus
+    if isinstance(xanadus[0], int):
+        xanadus = (xanadus,)
+    return BitboardLunarLockoutState(state.action_code, state.gval, None, size,
+                                     tuple(y * size + x for x, y in state.robots),
+                                     tuple(y * size + x for x, y in xanadus))
+
+
+def from_bitboard(state):
+    '''Returns the LunarLockoutState equivalent to a BitboardLunarLockoutState.'''
+    return LunarLockoutState(state.action_code, state.gval, None, state.size, state.robots, state.xanadus)
+
+
+def bitboard_goal_state(state):
+    '''Returns True if we have reached a goal state'''
+    '''INPUT: a BitboardLunarLockout state'''
+    '''OUTPUT: True (if goal) or False (if not)'''
+    center = (state.size * state.size) // 2
+    for cell in state.xanadu_cells:
+        if cell != center:
+            return False
+    return True
+
+
+def bitboard_dead_state(state):
+    '''Returns True if no xanadu that is not yet in the center can ever reach it, see
+       lunarlockout.lockout_dead_state.'''
+    center = (state.size * state.size) // 2
+    table = _cell_dead_table(state.size)
+    bits = 0
+    solved = True
+    for cell in state.xanadu_cells:
+        if cell != center:
+            bits |= table[cell]
+            solved = False
+    if solved:
+        return False
+    for cell in state.robot_cells:
+        bits |= table[cell]
+    return _dead_bits(bits)
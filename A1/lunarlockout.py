@@ -13,15 +13,116 @@
 
 from search import *
 import random
+import threading
+
+# Board symmetries by board size, see _symmetries.
+_SYMMETRIES = dict()
+
+# Dead position tables by board size, see _dead_table.
+_DEAD_TABLES = dict()
+
+# Bits of the dead position table: the location is left of, right of,
+# above or below the center (by at least one column or row), and is on
+# or left of, on or right of, on or above or on or below the center.
+_WEST, _EAST, _NORTH, _SOUTH = 1, 2, 4, 8
+_WEST_OR_ON, _EAST_OR_ON, _NORTH_OR_ON, _SOUTH_OR_ON = 16, 32, 64, 128
+# the bits of the blockers needed to stop a xanadu in the center with a
+# move along the center row, or along the center column.
+_ROW_FINISH = _WEST | _EAST | _NORTH_OR_ON | _SOUTH_OR_ON
+_COLUMN_FINISH = _NORTH | _SOUTH | _WEST_OR_ON | _EAST_OR_ON
+
+# One shared tuple per board location, so that moving a piece does not
+# give every new state its own copy of the location.
+_LOCATIONS = dict()
+
+# Actions are stored as small integer codes, piece * 8 + 4 * (1 if the
+# piece is a xanadu else 0) + the index of the direction in (UP, RIGHT,
+# DOWN, LEFT), and named only when asked for. Action names by code, see
+# action_name, which extends the list holding _ACTION_NAMES_LOCK.
+_ACTION_NAMES = []
+_ACTION_NAMES_LOCK = threading.Lock()
+
+# The action property of the states hides StateSpace's action slot, which
+# still holds the action code and is read and written through this.
+_ACTION_SLOT = StateSpace.action
+
+
+def action_code(piece, is_xanadu, direction):
+    '''Return the code of the action moving the given robot (or xanadu)
+       in the direction with the given index in (UP, RIGHT, DOWN, LEFT).'''
+    return piece * 8 + (4 if is_xanadu else 0) + direction
+
+
+def action_name(action):
+    '''Return the name, e.g. "a up", of an action code. Actions that are
+       already names, such as "START", are returned unchanged.'''
+    if not isinstance(action, int):
+        return action
+    if len(_ACTION_NAMES) <= action:
+        with _ACTION_NAMES_LOCK:
+            while len(_ACTION_NAMES) <= action:
+                piece = len(_ACTION_NAMES) // 8
+                for first in ('a', 'A'):
+                    for direction in (UP, RIGHT, DOWN, LEFT):
+                        _ACTION_NAMES.append(chr(ord(first) + piece) + " " + direction.name)
+    return _ACTION_NAMES[action]
+
+
+def _symmetries(size):
+    '''Return the eight symmetries of a square board of the given size (its
+       rotations and reflections, all of which fix the center) as
+       dictionaries mapping each location to its image.'''
+    table = _SYMMETRIES.get(size)
+    if table is None:
+        n = size - 1
+        maps = ((lambda x, y: (x, y)), (lambda x, y: (n - y, x)), (lambda x, y: (n - x, n - y)),
+                (lambda x, y: (y, n - x)), (lambda x, y: (n - x, y)), (lambda x, y: (x, n - y)),
+                (lambda x, y: (y, x)), (lambda x, y: (n - y, n - x)))
+        table = [dict(((x, y), f(x, y)) for x in range(size) for y in range(size)) for f in maps]
+        _SYMMETRIES[size] = table
+    return table
+
+
+def _dead_table(size):
+    '''Return the dead position table for a board of the given size: a
+       dictionary mapping each location to its _WEST ... _SOUTH_OR_ON bits,
+       see lockout_dead_state.'''
+    table = _DEAD_TABLES.get(size)
+    if table is None:
+        center = (size - 1) // 2
+        table = dict()
+        for x in range(size):
+            for y in range(size):
+                bits = 0
+                if x < center:
+                    bits |= _WEST
+                if x > center:
+                    bits |= _EAST
+                if y < center:
+                    bits |= _NORTH
+                if y > center:
+                    bits |= _SOUTH
+                if x <= center:
+                    bits |= _WEST_OR_ON
+                if x >= center:
+                    bits |= _EAST_OR_ON
+                if y <= center:
+                    bits |= _NORTH_OR_ON
+                if y >= center:
+                    bits |= _SOUTH_OR_ON
+                table[(x, y)] = bits
+        _DEAD_TABLES[size] = table
+    return table
 
 
 class LunarLockoutState(StateSpace):
+    __slots__ = ('size', 'robots', 'xanadus')
 
     def __init__(self, action, gval, parent, size, robots, xanadus):
         '''
         Creates a new LunarLockoutState state.
-        @param width: The room's X dimension (excluding walls).
-        @param height: The room's Y dimension (excluding walls).
+        @param action: The action name, or action code (see action_code), that created this state.
+        @param size: The room's X and Y dimension (excluding walls).
         @param robots: A tuple of all the robots' locations. Each robot is denoted by its index in the list.
         @param xanadus: A tuple of all the xanadus' locations. Each xanadus is denoted by its index in the list.
         '''
@@ -31,12 +132,32 @@ class LunarLockoutState(StateSpace):
             print("Boards must be of odd dimension. Board has been enlardged by one block.")
 
         StateSpace.__init__(self, action, gval, parent)
-        self.width = size
-        self.height = size
+        self.size = size
 
         self.robots = robots
         self.xanadus = xanadus
 
+    @property
+    def action(self):
+        return action_name(_ACTION_SLOT.__get__(self))
+
+    @action.setter
+    def action(self, action):
+        _ACTION_SLOT.__set__(self, action)
+
+    @property
+    def action_code(self):
+        '''The action as stored: an action code, or a name such as "START".'''
+        return _ACTION_SLOT.__get__(self)
+
+    @property
+    def width(self):
+        return self.size
+
+    @property
+    def height(self):
+        return self.size
+
     def getRobots(self):
         return self.robots
 
@@ -60,7 +181,7 @@ class LunarLockoutState(StateSpace):
                 xanadubots = [i for i in self.xanadus if i[0] != center or i[1] != center]
                 other_robots = tuple(other_robots) + tuple(xanadubots)
 
-            for direction in (UP, RIGHT, DOWN, LEFT):
+            for d, direction in enumerate((UP, RIGHT, DOWN, LEFT)):
 
                 new_location = direction.move(self.robots[robot], other_robots)
                 if new_location == None:
@@ -73,11 +194,11 @@ class LunarLockoutState(StateSpace):
                     continue
 
                 new_robots = list(self.robots)
-                new_robots[robot] = new_location
+                new_robots[robot] = _LOCATIONS.setdefault(new_location, new_location)
                 new_robots = tuple(new_robots)
 
-                new_state = LunarLockoutState(chr(ord('a') + robot) + " " + direction.name, self.gval + transition_cost,
-                                              self, self.width, new_robots, self.xanadus)
+                new_state = LunarLockoutState(action_code(robot, False, d), self.gval + transition_cost,
+                                              self, self.size, new_robots, self.xanadus)
                 successors.append(new_state)
 
         if (isinstance(self.xanadus[0], int)):
@@ -98,7 +219,7 @@ class LunarLockoutState(StateSpace):
                 other_robots = [x for x in other_robots if (x[0] != center or x[1] != center)]
                 other_robots = tuple(other_robots) + self.robots
 
-            for direction in (UP, RIGHT, DOWN, LEFT):
+            for d, direction in enumerate((UP, RIGHT, DOWN, LEFT)):
                 new_location = direction.move(xanadu, other_robots)
 
                 if new_location == None:
@@ -112,21 +233,34 @@ class LunarLockoutState(StateSpace):
                         continue
 
                 if (isinstance(self.xanadus[0], int)):
-                    new_xanadus = new_location
+                    new_xanadus = _LOCATIONS.setdefault(new_location, new_location)
                 else:
                     new_xanadus = list(self.xanadus)
-                    new_xanadus[robot] = new_location
+                    new_xanadus[robot] = _LOCATIONS.setdefault(new_location, new_location)
                     new_xanadus = tuple(new_xanadus)
 
-                new_state = LunarLockoutState(chr(ord('A') + robot) + " " + direction.name, self.gval + transition_cost,
-                                              self, self.width, self.robots, new_xanadus)
+                new_state = LunarLockoutState(action_code(robot, True, d), self.gval + transition_cost,
+                                              self, self.size, self.robots, new_xanadus)
                 successors.append(new_state)
 
         return successors
 
     def hashable_state(self):
         '''Return a data item that can be used as a dictionary key to UNIQUELY represent a state.'''
-        return hash((self.robots, self.xanadus))
+        return (self.robots, self.xanadus)
+
+    def canonical_state(self):
+        '''
+        Return a data item shared by all states that are the same as this one up to a rotation or reflection
+        of the board and a relabelling of the robots (and of the xanadus). These states all need the same
+        number of moves to reach the goal.
+        '''
+        xanadus = self.xanadus
+        if isinstance(xanadus[0], int):
+            xanadus = (xanadus,)
+        robots = self.robots
+        return min((tuple(sorted([m[xanadu] for xanadu in xanadus])), tuple(sorted([m[robot] for robot in robots])))
+                   for m in _symmetries(self.width))
 
     def state_string(self):
         '''Returns a string representation fo a state that can be printed to stdout.'''
@@ -194,6 +328,37 @@ def lockout_goal_state(state):
     return True
 
 
+def _dead_bits(bits):
+    '''Return True if the OR of the dead position table bits of the
+       pieces that can stop a move shows that no xanadu can reach the center.'''
+    return bits & _ROW_FINISH != _ROW_FINISH and bits & _COLUMN_FINISH != _COLUMN_FINISH
+
+
+def lockout_dead_state(state):
+    '''Returns True if no xanadu that is not yet in the center can ever reach it.
+
+    A sliding piece stops next to the piece that blocks it, so no piece can leave the smallest rectangle holding
+    the robots and the xanadus outside the center. The last move of a xanadu into the center ends against a piece
+    next to the center, having started on the other side of it, so that rectangle must span the three middle
+    cells of the center row or of the center column. Use as a SearchEngine successor filter.'''
+    center = int((state.width - 1) / 2)
+    table = _dead_table(state.width)
+    xanadus = state.xanadus
+    if isinstance(xanadus[0], int):
+        xanadus = (xanadus,)
+    bits = 0
+    solved = True
+    for xanadu in xanadus:
+        if xanadu[0] != center or xanadu[1] != center:
+            bits |= table[xanadu]
+            solved = False
+    if solved:
+        return False
+    for robot in state.robots:
+        bits |= table[robot]
+    return _dead_bits(bits)
+
+
 # LunarLockout Directions: encodes directions of movement that are possible for each robot.
 class Direction():
     '''
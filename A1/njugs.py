@@ -0,0 +1,254 @@
+'''N jug water jugs routines.
+
+    A) Class NJugs
+
+    A WaterJugs state space for any number of jugs of any capacities. A
+    state is one integer, the volumes of the jugs written as a mixed radix
+    number whose i-th digit, of radix capacities[i] + 1, is the volume of
+    jug i. The actions are those of WaterJugs: empty a jug, fill a jug or
+    pour one jug into another until the first is empty or the second is
+    full, each of cost 1. For jugs of capacities (3, 4) the successors and
+    their order are those of WaterJugs.
+
+    Successor codes are computed by adding and subtracting multiples of the
+    place values of the jugs, and the action names are made once per set
+    of capacities, so the only objects created per successor are the
+    successor states themselves.
+
+    B) The goal function njugs_goal_fn (the goal is set, with '*' wild
+    cards, by njugs_set_goal) and the heuristic njugs_h_mismatch_function.
+
+    C) Breadth-first search fast path
+
+    reachable_states explores every state reachable from an initial state
+    on state codes alone, without making states or search nodes, keeping
+    the visited states in a bytearray bitmap of one bit per possible state
+    (the product of capacities[i] + 1 bits). reachable_volumes uses it to
+    answer which volumes can be measured in some jug.
+'''
+
+from search import *
+
+# Move tables by capacities, see _jug_table.
+_JUG_TABLES = dict()
+
+
+def _jug_table(capacities):
+    '''Return the move table for jugs of the given capacities, a pair of
+       the place value of each jug and a tuple of (jug, capacity, place
+       value, empty action, fill action, tuple of (other jug, its capacity,
+       its place value, pour action)) for each jug.'''
+    table = _JUG_TABLES.get(capacities)
+    if table is None:
+        places = []
+        place = 1
+        for capacity in capacities:
+            places.append(place)
+            place = place * (capacity + 1)
+        jugs = []
+        for i, capacity in enumerate(capacities):
+            pours = tuple((j, capacities[j], places[j], 'Pour jug {} into jug {}'.format(i, j))
+                          for j in range(len(capacities)) if j != i)
+            jugs.append((i, capacity, places[i], 'Empty jug {}'.format(i), 'Fill jug {}'.format(i), pours))
+        table = (tuple(places), tuple(jugs))
+        _JUG_TABLES[capacities] = table
+    return table
+
+
+def _moves(table, code):
+    '''Return the (action, successor code) pairs of the state code.'''
+    places, jugs = table
+    volumes = [(code // place) % (jug[1] + 1) for place, jug in zip(places, jugs)]
+    moves = []
+    for i, capacity, place, empty, fill, _ in jugs:
+        volume = volumes[i]
+        if volume > 0:
+            moves.append((empty, code - volume * place))
+        if volume < capacity:
+            moves.append((fill, code + (capacity - volume) * place))
+    for i, _, place, _, _, pours in jugs:
+        volume = volumes[i]
+        if volume == 0:
+            continue
+        for j, capacity, other_place, pour in pours:
+            amount = capacity - volumes[j]
+            if amount > volume:
+                amount = volume
+            if amount > 0:
+                moves.append((pour, code - amount * place + amount * other_place))
+    return moves
+
+
+def encode(capacities, volumes):
+    '''Return the code of the jug volumes.'''
+    places, _ = _jug_table(tuple(capacities))
+    code = 0
+    for place, volume in zip(places, volumes):
+        code = code + volume * place
+    return code
+
+
+def decode(capacities, code):
+    '''Return the tuple of jug volumes of a code.'''
+    places, _ = _jug_table(tuple(capacities))
+    return tuple((code // place) % (capacity + 1) for place, capacity in zip(places, capacities))
+
+
+class NJugs(StateSpace):
+    __slots__ = ('capacities', 'code')
+
+    def __init__(self, action, gval, parent, capacities, code):
+        '''
+        Creates a new NJugs state.
+        @param capacities: A tuple of the capacities of the jugs.
+        @param code: The volumes of the jugs as a mixed radix integer, see encode.
+        '''
+        StateSpace.__init__(self, action, gval, parent)
+        self.capacities = capacities
+        self.code = code
+
+    @property
+    def volumes(self):
+        return decode(self.capacities, self.code)
+
+    def successors(self):
+        '''
+        Generates all the actions that can be performed from this state, and the states those actions will create.
+        '''
+        capacities = self.capacities
+        gval = self.gval + 1
+        return [NJugs(action, gval, self, capacities, code)
+                for action, code in _moves(_jug_table(capacities), self.code)]
+
+    def hashable_state(self):
+        '''Return a data item that can be used as a dictionary key to UNIQUELY represent a state.'''
+        return self.code
+
+    def print_state(self):
+        if self.parent:
+            print("Action= \"{}\", S{}, g-value = {}, volumes = {}, (From S{})".format(self.action, self.index,
+                                                                                      self.gval, self.volumes,
+                                                                                      self.parent.index))
+        else:
+            print("Action=\"{}\", S{}, g-value = {}, volumes = {}, (Initial state)".format(self.action, self.index,
+                                                                                          self.gval, self.volumes))
+
+
+def njugs_state(capacities, volumes=None):
+    '''Returns the initial NJugs state with the given volumes (default: every jug empty).'''
+    capacities = tuple(capacities)
+    return NJugs("START", 0, None, capacities, encode(capacities, volumes) if volumes else 0)
+
+
+# We use this to store the current goal
+# So that the heuristics functions can get access to it
+NJugs.goal_state = False
+
+
+def njugs_set_goal(*volumes):
+    '''set the current goal, one volume or '*' per jug'''
+    NJugs.goal_state = volumes
+
+
+def njugs_goal_fn(state):
+    '''test if the state is equal to the current goal,
+    allow wild cards '*' in the goal state'''
+    for goal, volume in zip(NJugs.goal_state, state.volumes):
+        if goal != '*' and goal != volume:
+            return False
+    return True
+
+
+def njugs_h_mismatch_function(state):
+    '''An action changes the volumes of at most two jugs, so at least half
+       of the jugs whose volume differs from the goal take an action each.'''
+    mismatched = 0
+    for goal, volume in zip(NJugs.goal_state, state.volumes):
+        if goal != '*' and goal != volume:
+            mismatched = mismatched + 1
+    return (mismatched + 1) // 2
+
+
+def reachable_states(capacities, volumes=None):
+    '''
+    Breadth-first search of every state reachable from the given volumes, see the module docstring.
+
+    @param capacities: the capacities of the jugs.
+    @param volumes: the initial volumes of the jugs (default: every jug empty).
+    @return: a tuple (bitmap, layers). Bit code % 8 of byte code // 8 of the bitmap is set if the state code is
+             reachable, and layers is the number of states at each depth.
+    '''
+    capacities = tuple(capacities)
+    table = _jug_table(capacities)
+    states = 1
+    for capacity in capacities:
+        states = states * (capacity + 1)
+    bitmap = bytearray((states + 7) // 8)
+
+    code = encode(capacities, volumes) if volumes else 0
+    bitmap[code >> 3] |= 1 << (code & 7)
+    layer = [code]
+    layers = []
+    while layer:
+        layers.append(len(layer))
+        next_layer = []
+        for code in layer:
+            for _, succ in _moves(table, code):
+                byte = succ >> 3
+                bit = 1 << (succ & 7)
+                if not bitmap[byte] & bit:
+                    bitmap[byte] |= bit
+                    next_layer.append(succ)
+        layer = next_layer
+    return bitmap, layers
+
+
+def reachable_volumes(capacities, volumes=None):
+    '''Return the sorted list of the volumes that can be measured in some
+       jug starting from the given volumes (default: every jug empty).'''
+    capacities = tuple(capacities)
+    bitmap, _ = reachable_states(capacities, volumes)
+    places, _ = _jug_table(capacities)
+    measured = bytearray(max(capacities) + 1)
+    for byte, bits in enumerate(bitmap):
+        while bits:
+            low = bits & -bits
+            code = byte * 8 + low.bit_length() - 1
+            for place, capacity in zip(places, capacities):
+                measured[(code // place) % (capacity + 1)] = 1
+            bits = bits ^ low
+    return [volume for volume, seen in enumerate(measured) if seen]
+
+
+if __name__ == "__main__":
+    import time
+
+    se = SearchEngine('astar', 'full')
+
+    capacities = (3, 4)
+    njugs_set_goal(2, 0)
+    print("=========Test 1. Astar on the WaterJugs problem========")
+    se.init_search(njugs_state(capacities), njugs_goal_fn, njugs_h_mismatch_function)
+    final = se.search()
+    if final: final.print_path()
+    print("===================================================")
+    print("")
+
+    capacities = (5, 7, 11, 13, 17)
+    njugs_set_goal(1, '*', '*', '*', 16)
+    print("=========Test 2. Breadth first on {} jugs==========".format(capacities))
+    se.set_strategy('breadth_first', 'full')
+    se.init_search(njugs_state(capacities), njugs_goal_fn)
+    final = se.search()
+    if final: final.print_path()
+    print("===================================================")
+    print("")
+
+    capacities = (3, 5, 7, 11, 13, 17)
+    print("=========Test 3. Reachable volumes of {} jugs=====".format(capacities))
+    start = time.monotonic()
+    bitmap, layers = reachable_states(capacities)
+    print("{} reachable states in {} layers, a {} byte bitmap, {:.2f} sec".format(
+        sum(layers), len(layers), len(bitmap), time.monotonic() - start))
+    print("Volumes that can be measured: {}".format(reachable_volumes(capacities)))
+    print("===================================================")
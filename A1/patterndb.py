@@ -0,0 +1,347 @@
+'''Pattern database heuristics for LunarLockout.
+
+    A) Building
+
+    A pattern database holds, for every abstract board made of one xanadu
+    and a number of helper pieces (robots or other xanadus, which are
+    interchangeable as blockers), the exact number of moves the xanadu
+    needs to reach the center when only those pieces are on the board. The
+    distances are computed for one board size at a time, with build_table,
+    by a backward breadth-first search that starts from every abstract
+    board with the xanadu in the center and undoes moves.
+
+    A table for a board of N cells and k helpers is a bytearray of
+    N * C(N, k) entries, one distance byte per xanadu cell and set of helper
+    cells (cells are numbered y * size + x, and a set of helper cells is
+    ranked in the combinatorial number system). Abstract boards from which
+    the center can not be reached hold UNREACHABLE.
+
+    B) Storage
+
+    PatternDatabase.save writes the tables for several board sizes to one
+    binary file (a header giving each table's board size, helper count and
+    offset, followed by the tables). PatternDatabase.load memory-maps the
+    file, so loading takes no longer than reading the header and lookups
+    index straight into the mapped tables.
+
+    C) Heuristics
+
+    PatternDatabaseHeuristic(path, combine) is a heur_fn. For each xanadu
+    not in the center it takes the helpers to be the other pieces nearest
+    the xanadu (by Manhattan distance, ties broken by cell), which the
+    xanadu is the most likely to stop against, so that each xanadu costs
+    one table lookup. The estimate is never below the xanadu's L distance.
+    The estimates for the xanadus are then added ('add') or maximised
+    ('max'). The heuristic memory-maps its file on its first call and
+    pickles as its path, so it can be handed to worker processes.
+    pdb_heuristic(pdb, combine) makes one for an already loaded database.
+
+    Removing pieces from the board removes blockers, and therefore moves,
+    as well as obstacles, so an abstract distance can be larger than the
+    true distance: these heuristics are not admissible.
+
+    Example:
+        python patterndb.py --sizes 5 7 --helpers 3 --output lunarlockout.pdb
+'''
+
+import argparse
+import itertools
+import math
+import mmap
+import os
+import struct
+import time
+
+from search import *
+from lunarlockout import lockout_goal_state
+
+UNREACHABLE = 255
+
+DEFAULT_PDB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lunarlockout.pdb')
+
+_MAGIC = b'LLPD'
+_VERSION = 1
+# file header: magic, version, number of tables
+_HEADER = struct.Struct('<4sHH')
+# table header: board size, helpers, offset of the table in the file
+_TABLE_HEADER = struct.Struct('<BBQ')
+
+# (dx, dy) of the four directions of movement
+_DELTAS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+
+def _unmove_table(size):
+    '''Return, for each cell and direction, a pair (cell one step in that
+       direction or None, tuple of the cells in the opposite direction from
+       nearest to furthest). A piece that slid in a direction and stopped
+       at a cell, against a piece on the first cell, started from one of
+       the second cells.'''
+    table = []
+    for cell in range(size * size):
+        x, y = cell % size, cell // size
+        entries = []
+        for dx, dy in _DELTAS:
+            stop = None
+            if 0 <= x + dx < size and 0 <= y + dy < size:
+                stop = (y + dy) * size + x + dx
+            ray = []
+            rx, ry = x - dx, y - dy
+            while 0 <= rx < size and 0 <= ry < size:
+                ray.append(ry * size + rx)
+                rx, ry = rx - dx, ry - dy
+            entries.append((stop, tuple(ray)))
+        table.append(tuple(entries))
+    return table
+
+
+def _binomials(cells, helpers):
+    '''Return a table of C(cell, i + 1) for each cell and i < helpers, the
+       terms of the rank of a set of helper cells.'''
+    return tuple(tuple(math.comb(cell, i + 1) for i in range(helpers)) for cell in range(cells))
+
+
+def _table_length(cells, helpers):
+    return cells * math.comb(cells, helpers)
+
+
+def _index(binomials, combinations, xanadu, helpers):
+    '''Return the table index of a xanadu cell and sorted helper cells,
+       where combinations is the number of sets of helper cells.'''
+    index = xanadu * combinations
+    for i, helper in enumerate(helpers):
+        index = index + binomials[helper][i]
+    return index
+
+
+def build_table(size, helpers=3):
+    '''Return the pattern database table for boards of the given size with
+       the given number of helper pieces, see the module docstring.'''
+    cells = size * size
+    center = cells // 2
+    unmove = _unmove_table(size)
+    binomials = _binomials(cells, helpers)
+    combinations = math.comb(cells, helpers)
+    table = bytearray([UNREACHABLE]) * _table_length(cells, helpers)
+
+    layer = []
+    for pieces in itertools.combinations([cell for cell in range(cells) if cell != center], helpers):
+        index = _index(binomials, combinations, center, pieces)
+        table[index] = 0
+        layer.append((center, pieces))
+
+    distance = 0
+    while layer and distance < UNREACHABLE - 1:
+        distance = distance + 1
+        next_layer = []
+        for xanadu, pieces in layer:
+            occupied = set(pieces)
+            occupied.add(xanadu)
+            # on the goal boards only xanadu moves are undone, as undoing a
+            # helper move there gives another goal board.
+            movers = [(xanadu, -1)]
+            if xanadu != center:
+                movers.extend((piece, i) for i, piece in enumerate(pieces))
+            for piece, i in movers:
+                for stop, ray in unmove[piece]:
+                    if stop is None or stop not in occupied:
+                        continue
+                    for start in ray:
+                        if start in occupied:
+                            break
+                        if i < 0:
+                            if start == center:
+                                continue
+                            new_xanadu, new_pieces = start, pieces
+                        else:
+                            new_xanadu = xanadu
+                            new_pieces = tuple(sorted(pieces[:i] + (start,) + pieces[i + 1:]))
+                        index = _index(binomials, combinations, new_xanadu, new_pieces)
+                        if table[index] == UNREACHABLE:
+                            table[index] = distance
+                            next_layer.append((new_xanadu, new_pieces))
+        layer = next_layer
+    return table
+
+
+class PatternDatabase:
+    '''Pattern database tables by board size. Each table is a bytearray or
+       a memoryview of a memory-mapped file, with its number of helpers.'''
+
+    def __init__(self, tables=None):
+        '''
+        @param tables: a dictionary mapping board sizes to (helpers, table) pairs.
+        '''
+        self.tables = dict(tables) if tables else dict()
+        self.mapped = None
+        # ranking tables by board size, see _binomials.
+        self.ranks = dict()
+
+    @classmethod
+    def build(cls, sizes=(5, 7), helpers=3):
+        '''Build the tables for the given board sizes.'''
+        return cls(dict((size, (helpers, build_table(size, helpers))) for size in sizes))
+
+    def save(self, path):
+        '''Write the tables to a pattern database file.'''
+        sizes = sorted(self.tables)
+        offset = _HEADER.size + _TABLE_HEADER.size * len(sizes)
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(sizes)))
+            for size in sizes:
+                helpers, table = self.tables[size]
+                f.write(_TABLE_HEADER.pack(size, helpers, offset))
+                offset = offset + len(table)
+            for size in sizes:
+                f.write(self.tables[size][1])
+
+    @classmethod
+    def load(cls, path=DEFAULT_PDB_PATH):
+        '''Memory-map a pattern database file written by save.'''
+        if not os.path.exists(path):
+            print("No pattern database {}, build it with python patterndb.py".format(path))
+            return None
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(mapped, 0)
+        if magic != _MAGIC or version != _VERSION:
+            mapped.close()
+            print("{} is not a version {} LunarLockout pattern database".format(path, _VERSION))
+            return None
+        view = memoryview(mapped)
+        tables = dict()
+        for i in range(count):
+            size, helpers, offset = _TABLE_HEADER.unpack_from(mapped, _HEADER.size + i * _TABLE_HEADER.size)
+            tables[size] = (helpers, view[offset:offset + _table_length(size * size, helpers)])
+        pdb = cls(tables)
+        pdb.mapped = mapped
+        return pdb
+
+    def close(self):
+        '''Release a memory-mapped file.'''
+        if self.mapped is not None:
+            for size in self.tables:
+                self.tables[size][1].release()
+            self.tables = dict()
+            self.mapped.close()
+            self.mapped = None
+
+    def xanadu_distance(self, size, xanadu, others):
+        '''Return the table distance for the xanadu cell with the other (non
+           center) pieces nearest it as helpers, see the module docstring, or
+           UNREACHABLE if there is no table for the board size, too few
+           other pieces or the helpers do not let the xanadu reach the center.'''
+        entry = self.tables.get(size)
+        if entry is None:
+            return UNREACHABLE
+        helpers, table = entry
+        if len(others) < helpers:
+            return UNREACHABLE
+        rank = self.ranks.get(size)
+        if rank is None:
+            rank = (_binomials(size * size, helpers), math.comb(size * size, helpers))
+            self.ranks[size] = rank
+        binomials, combinations = rank
+        x, y = xanadu % size, xanadu // size
+        nearest = sorted(others, key=lambda cell: (abs(cell % size - x) + abs(cell // size - y), cell))
+        return table[_index(binomials, combinations, xanadu, sorted(nearest[:helpers]))]
+
+
+class PatternDatabaseHeuristic:
+    '''A LunarLockout heur_fn looking up a pattern database, see the module
+       docstring. Instances pickle as their path and combination, plus the
+       tables of a database built in memory, so they can be used by worker
+       processes.'''
+
+    __name__ = 'heur_pattern_database'
+
+    def __init__(self, path=DEFAULT_PDB_PATH, combine='max', pdb=None):
+        '''
+        @param path: the pattern database file, memory-mapped on the first call.
+        @param combine: 'max' or 'add', how the estimates for the xanadus are combined.
+        @param pdb: an already loaded PatternDatabase to use instead of the file.
+        '''
+        self.path = path
+        self.combine = combine
+        self.pdb = pdb
+
+    def __getstate__(self):
+        tables = None
+        if self.pdb is not None and self.pdb.mapped is None:
+            tables = self.pdb.tables
+        return (self.path, self.combine, tables)
+
+    def __setstate__(self, state):
+        self.path, self.combine, tables = state
+        self.pdb = PatternDatabase(tables) if tables is not None else None
+
+    def __call__(self, state):
+        '''Pattern database LunarLockout heuristic'''
+        pdb = self.pdb
+        if pdb is None:
+            # without the file every estimate is the L distance
+            pdb = PatternDatabase.load(self.path) or PatternDatabase()
+            self.pdb = pdb
+        size = state.width
+        center = (size * size) // 2
+        middle = (size - 1) // 2
+        xanadus = state.xanadus
+        if isinstance(xanadus[0], int):
+            xanadus = (xanadus,)
+        xanadus = [y * size + x for x, y in xanadus]
+        robots = [y * size + x for x, y in state.robots]
+        result = 0
+        for i, xanadu in enumerate(xanadus):
+            if xanadu == center:
+                continue
+            others = robots + [other for j, other in enumerate(xanadus) if j != i and other != center]
+            distance = pdb.xanadu_distance(size, xanadu, others)
+            l_distance = (xanadu % size != middle) + (xanadu // size != middle)
+            if distance == UNREACHABLE or distance < l_distance:
+                distance = l_distance
+            if self.combine == 'add':
+                result = result + distance
+            elif distance > result:
+                result = distance
+        return result
+
+
+def pdb_heuristic(pdb, combine='max'):
+    '''Return a LunarLockout heur_fn looking up the pattern database pdb,
+       combining the estimates for the xanadus with 'max' or 'add'.'''
+    if not combine in ['max', 'add']:
+        print('Unknown combination specified:', combine)
+        print("Must be one of ['max', 'add']")
+        return None
+    return PatternDatabaseHeuristic(combine=combine, pdb=pdb)
+
+
+if __name__ == "__main__":
+    from solution import heur_alternate, PROBLEMS
+
+    parser = argparse.ArgumentParser(description='Build a LunarLockout pattern database.')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[5, 7])
+    parser.add_argument('--helpers', type=int, default=3)
+    parser.add_argument('--output', default=DEFAULT_PDB_PATH)
+    parser.add_argument('--timebound', type=float, default=2, help='seconds per problem for the comparison')
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    PatternDatabase.build(args.sizes, args.helpers).save(args.output)
+    print("Built {} in {:.2f} sec".format(args.output, time.monotonic() - start))
+
+    start = time.monotonic()
+    pdb = PatternDatabase.load(args.output)
+    print("Loaded {} in {:.4f} sec".format(args.output, time.monotonic() - start))
+
+    heur_pdb = pdb_heuristic(pdb, 'add')
+    for i in range(len(PROBLEMS)):
+        if PROBLEMS[i].width not in pdb.tables:
+            continue
+        row = []
+        for heur_fn in (heur_alternate, heur_pdb):
+            se = SearchEngine('astar', 'full')
+            se.init_search(PROBLEMS[i], lockout_goal_state, heur_fn)
+            final = se.search(args.timebound)
+            row.append("{} cost {} expanded {}".format(heur_fn.__name__, final.gval if final else None, se.expanded))
+        print("PROBLEM {}: {}".format(i, ", ".join(row)))
+    pdb.close()
@@ -0,0 +1,157 @@
+'''Portfolio solver for LunarLockout.
+
+    A single SearchEngine runs one strategy on one core. The routines here
+    run several search configurations on the same LunarLockoutState in
+    parallel worker processes and combine their results:
+
+    A) portfolio_search
+
+    A generator that starts one worker process per configuration and
+    yields (configuration name, goal state) each time a worker improves on
+    the best solution found so far. It stops the workers once a solution
+    is proved optimal, every worker has finished, or the timebound expires.
+
+    B) portfolio_solve
+
+    Runs portfolio_search to completion and returns the best goal state.
+
+    Each configuration is a tuple (name, strategy, heur_fn, weight, proves_optimal):
+      a) strategy is a SearchEngine strategy; 'custom' searches order OPEN
+         by fval_function with the given weight.
+      b) heur_fn must be a module level function so that it can be sent to
+         the worker processes.
+      c) proves_optimal is True if the first solution found by the
+         configuration is optimal (e.g. an admissible heuristic with astar
+         or ida_star).
+    Every worker is anytime: after each solution it resumes its search with
+    the cost bound tightened below that solution's cost. A worker whose
+    search is exhausted under that bound has proved its solution optimal.
+'''
+
+import multiprocessing
+import queue
+import time
+
+from search import *
+from lunarlockout import LunarLockoutState, lockout_goal_state
+from solution import heur_alternate, heur_L_distance, fval_function, PROBLEMS
+
+DEFAULT_PORTFOLIO = (
+    ('astar alternate', 'astar', heur_alternate, None, False),
+    ('custom weight 2', 'custom', heur_alternate, 2., False),
+    ('custom weight 3', 'custom', heur_alternate, 3., False),
+    ('custom weight 5', 'custom', heur_alternate, 5., False),
+    ('best_first alternate', 'best_first', heur_alternate, None, False),
+    ('ida_star L distance', 'ida_star', heur_L_distance, None, True),
+)
+
+# Messages sent by the workers on the results queue are tuples of
+# (configuration name, kind, goal state or None).
+_SOLUTION = 0
+_OPTIMAL = 1
+_DONE = 2
+
+
+def _portfolio_worker(config, initial_state, timebound, results):
+    '''Run one portfolio configuration, reporting each improved solution.'''
+    name, strategy, heur_fn, weight, proves_optimal = config
+    se = SearchEngine(strategy)
+    if strategy == 'custom':
+        se.init_search(initial_state, lockout_goal_state, heur_fn, (lambda sN: fval_function(sN, weight)))
+    else:
+        se.init_search(initial_state, lockout_goal_state, heur_fn)
+
+    costbound = None
+    deadline = time.monotonic() + timebound
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        result = se.search(remaining, costbound)
+        if not result:
+            # an OPEN set emptied under the cost bound means no cheaper
+            # solution exists.
+            if costbound is not None and se.open is not None and se.open.empty():
+                results.put((name, _OPTIMAL, None))
+            break
+        results.put((name, _SOLUTION, result))
+        if proves_optimal and costbound is None:
+            results.put((name, _OPTIMAL, None))
+            break
+        costbound = (result.gval - 1, float("inf"), float("inf"))
+    results.put((name, _DONE, None))
+
+
+def portfolio_search(initial_state, timebound=2, configs=DEFAULT_PORTFOLIO):
+    '''Search for solutions to initial_state with every configuration in
+       configs in parallel, yielding (configuration name, goal state) for
+       each solution cheaper than all solutions yielded before.'''
+    ctx = multiprocessing.get_context()
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_portfolio_worker, args=(config, initial_state, timebound, results), daemon=True)
+               for config in configs]
+    for worker in workers:
+        worker.start()
+
+    deadline = time.monotonic() + timebound
+    running = len(workers)
+    best_cost = float("inf")
+    try:
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                name, kind, state = results.get(timeout=min(remaining, 0.05))
+            except queue.Empty:
+                continue
+            if kind == _SOLUTION and state.gval < best_cost:
+                best_cost = state.gval
+                yield name, state
+            elif kind == _OPTIMAL:
+                break
+            elif kind == _DONE:
+                running = running - 1
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+
+
+def portfolio_solve(initial_state, timebound=2, configs=DEFAULT_PORTFOLIO):
+    '''Return the cheapest goal state found by portfolio_search within the
+       timebound, or False if no configuration found a solution.'''
+    solution = False
+    for name, state in portfolio_search(initial_state, timebound, configs):
+        solution = state
+    return solution
+
+
+if __name__ == "__main__":
+
+    solved = 0;
+    unsolved = [];
+    timebound = 2;  # 2 second time limit for each problem
+    print("Running the portfolio solver")
+
+    for i in range(len(PROBLEMS)):
+        print("*************************************")
+        print("PROBLEM {}".format(i))
+
+        s0 = PROBLEMS[i]
+        final = False
+        for name, state in portfolio_search(s0, timebound):
+            print("Solution of cost {} found by {}".format(state.gval, name))
+            final = state
+
+        if final:
+            solved += 1
+        else:
+            unsolved.append(i)
+
+    print("*************************************")
+    print("{} of {} problems solved in less than {} seconds.".format(solved, len(PROBLEMS), timebound))
+    print("Problems that remain unsolved in the set are Problems: {}".format(unsolved))
+    print("*************************************")
@@ -36,15 +36,40 @@
       search (using the init_search method) and resume the search after
       a goal is found (using searchOpen). See the implementation for details.
 
+      The search of the strategies that keep an OPEN set can also be saved
+      to a checkpoint file (using checkpoint, or periodically with
+      set_checkpoint) and resumed from it in another process (using
+      SearchEngine.resume).
+
     '''
 import heapq
-from collections import deque
+from collections import deque, OrderedDict
+import json
 import os
+import pickle
+import shelve
+import threading
+import time
+
+
+class _SearchContext(threading.local):
+    '''The SearchEngine running init_search or search in the current
+       thread, if any. It numbers the states and nodes created meanwhile,
+       so that engines searching in different threads (or one after the
+       other in the same thread) keep separate counts.'''
+    engine = None
+
+
+_context = _SearchContext()
 
 
 class StateSpace:
     '''Abstract class for defining State spaces for search routines'''
+    # the next index of a state created outside of a search
     n = 0
+    # subclasses may declare __slots__ for their own data items too, so
+    # that their states carry no per-object dictionary.
+    __slots__ = ('action', 'gval', 'parent', 'index')
 
     def __init__(self, action, gval, parent):
         '''Problem specific state space objects must always include the data items
@@ -59,8 +84,13 @@ class StateSpace:
         self.action = action
         self.gval = gval
         self.parent = parent
-        self.index = StateSpace.n
-        StateSpace.n = StateSpace.n + 1
+        engine = _context.engine
+        if engine is None:
+            self.index = StateSpace.n
+            StateSpace.n = StateSpace.n + 1
+        else:
+            self.index = engine.state_count
+            engine.state_count = engine.state_count + 1
 
     def successors(self):
         '''This method when invoked on a state space object must return a
@@ -70,6 +100,14 @@ class StateSpace:
            Also any problem specific data must be specified property.'''
         raise Exception("Must be overridden in subclass.")
 
+    def iter_successors(self):
+        '''This method may be overridden to return an iterator over the
+           successor states, e.g. a generator that creates them one at a
+           time. It is used by the pea_star and sma_star strategies, which
+           consume every successor of a node they expand. By default it
+           iterates over successors().'''
+        return iter(self.successors())
+
     def hashable_state(self):
         '''This method must return an immutable and unique representation
            of the state represented by self. The return value, e.g., a
@@ -78,6 +116,15 @@ class StateSpace:
            if and only if obj1 and obj2 represent the same problem state.'''
         raise Exception("Must be overridden in subclass.")
 
+    def canonical_state(self):
+        '''This method may be overridden to return an immutable representation
+           shared by all states that are equivalent under the problem's
+           symmetries (e.g. rotations of a board), which must have the same
+           cost to reach a goal. It is used in place of hashable_state() for
+           full cycle checking when the search engine's state key is set to
+           'canonical'. By default no symmetries are used.'''
+        return self.hashable_state()
+
     def print_state(self):
         '''Print a representation of the state'''
         raise Exception("Must be overridden in subclass.")
@@ -114,6 +161,23 @@ _BEST_FIRST = 2
 _ASTAR = 3
 _UCS = 4
 _CUSTOM = 5
+# Iterative deepening strategies. These do not use an OPEN set; they
+# repeat a depth-first search of the current path under a growing
+# threshold, so memory grows with the depth of the solution only.
+_IDA_STAR = 6
+_IDDFS = 7
+# Anytime Repairing A*: weighted A* whose weight is lowered after each
+# solution while reusing OPEN, the cc_dictionary and computed h-values.
+_ARA_STAR = 8
+# Partial Expansion A*: astar that only inserts the successors of a node
+# whose f-value is within the node's current f-value, putting the node
+# back on OPEN with the f-value of its next successors.
+_PEA_STAR = 9
+# Bounded memory strategies. beam search expands the nodes one layer at a
+# time, keeping only the best nodes (by fval_function) of each layer, and
+# sma_star is A* that evicts its worst leaves when it runs out of nodes.
+_BEAM = 10
+_SMA_STAR = 11
 
 # For best first and astar we use a priority queue. This requires
 # a comparison function for nodes. These constants indicate if we use
@@ -130,6 +194,21 @@ _CC_NONE = 0
 _CC_PATH = 1
 _CC_FULL = 2
 
+# The search engine reads the clock every so many expansions, adapting the
+# number so that it reads it about every _CHECK_PERIOD seconds (and at most
+# every _MAX_CHECK_INTERVAL expansions). See SearchEngine._deadline_reached.
+_CHECK_PERIOD = 0.005
+_MAX_CHECK_INTERVAL = 4096
+
+# The version of the checkpoint file format, and the SearchEngine data items
+# saved in it besides OPEN and the states, see SearchEngine.checkpoint.
+_CHECKPOINT_VERSION = 1
+_CHECKPOINT_FIELDS = ('strategy', 'cycle_check', 'frontier', 'state_key', 'beam_width', 'node_budget', 'trace',
+                      'node_count', 'state_count', 'cycle_check_pruned', 'cost_bound_pruned', 'stale_pruned',
+                      'dead_pruned', 'expanded', 'generated', 'peak_open', 'depth_histogram', 'record_solution',
+                      'checkpoints', 'checkpoint_time', 'cc_dictionary', 'bound_table', 'bound_table_costbound',
+                      'path_keys', 'path_set')
+
 
 # Zero Heuristic Function---for uninformed search don't include heur_fn
 # in call to search engine's search method, defaults heur_fn to the zero fn.
@@ -143,6 +222,15 @@ def _fval_function(state):
     return state.hval
 
 
+# State keys used for full cycle checking, see SearchEngine.set_state_key.
+def _hashable_key(state):
+    return state.hashable_state()
+
+
+def _canonical_key(state):
+    return state.canonical_state()
+
+
 class sNode:
     '''Object of this class form the nodes of the search space.  Each
     node consists of a search space object (determined by the problem
@@ -150,16 +238,26 @@ class sNode:
     redundant as it is stored in the state, but we make a copy in the
     node object for convenience), and the number of the node'''
 
+    # the next index of a node created outside of a search
     n = 0
-    lt_type = _SUM_HG
+    __slots__ = ('state', 'hval', 'gval', 'index', 'fval_function', 'depth', 'lt_type')
 
-    def __init__(self, state, hval, fval_function):
+    def __init__(self, state, hval, fval_function, depth=0):
         self.state = state
         self.hval = hval
         self.gval = state.gval
-        self.index = sNode.n
+        engine = _context.engine
+        if engine is None:
+            self.index = sNode.n
+            sNode.n = sNode.n + 1
+        else:
+            self.index = engine.node_count
+            engine.node_count = engine.node_count + 1
         self.fval_function = fval_function
-        sNode.n = sNode.n + 1
+        # the number of actions from the initial state
+        self.depth = depth
+        # what __lt__ compares, set by the OPEN the node is put on
+        self.lt_type = _SUM_HG
 
     def __lt__(self, other):
         '''For astar and best first we use a priority queue for the
@@ -173,17 +271,18 @@ class sNode:
            value. This means that we expand nodes along deeper paths
            first causing the search to proceed directly to the goal'''
 
-        if sNode.lt_type == _SUM_HG:
+        lt_type = self.lt_type
+        if lt_type == _SUM_HG:
             if (self.gval + self.hval) == (other.gval + other.hval):
                 # break ties by greatest gval.
                 return self.gval > other.gval
             else:
                 return ((self.gval + self.hval) < (other.gval + other.hval))
-        if sNode.lt_type == _G:
+        if lt_type == _G:
             return self.gval < other.gval
-        if sNode.lt_type == _H:
+        if lt_type == _H:
             return self.hval < other.hval
-        if sNode.lt_type == _C:
+        if lt_type == _C:
             return self.fval_function(self) < other.fval_function(other)
 
         print('sNode class has invalid comparator setting!')
@@ -192,6 +291,30 @@ class sNode:
         return self.gval < other.gval
 
 
+def _priority_key(search_strategy, weight=1., fvals=None):
+    '''Return a function computing the heap key of a node for the given
+       search strategy. The key mirrors the ordering of sNode.__lt__ but
+       is evaluated once, when the node is inserted into OPEN, so heap
+       operations only compare tuples of numbers. The weight is only used
+       by ara_star, whose key is the weighted f-value g + weight * h.
+       fvals is only used by pea_star, see SearchEngine._searchPEA.'''
+    if search_strategy == _UCS:
+        return lambda node: (node.gval,)
+    if search_strategy == _BEST_FIRST:
+        return lambda node: (node.hval,)
+    if search_strategy == _ASTAR:
+        # break ties between equal f-values by greatest gval.
+        return lambda node: (node.gval + node.hval, -node.gval)
+    if search_strategy == _CUSTOM:
+        return lambda node: (node.fval_function(node),)
+    if search_strategy == _ARA_STAR:
+        return lambda node: (node.gval + weight * node.hval, -node.gval)
+    if search_strategy == _PEA_STAR:
+        # the stored f-value of a node put back on OPEN, else g + h.
+        return lambda node: (fvals[node.index][0] if node.index in fvals else node.gval + node.hval, -node.gval)
+    return None
+
+
 class Open:
     '''Open objects hold the search frontier---the set of unexpanded
        nodes. Depending on the search strategy used we want to extract
@@ -199,7 +322,15 @@ class Open:
        functions to operate as needed by the particular search
        strategy'''
 
-    def __init__(self, search_strategy):
+    def __init__(self, search_strategy, keyed=True, weight=1., fvals=None):
+        '''When keyed is True the priority queue strategies store
+           (key, node index, node) entries, where the key is computed
+           once on insertion. Otherwise the nodes themselves are stored
+           and ordered by sNode.__lt__. ara_star is always keyed, by the
+           f-value weighted with weight, and so is pea_star, using the
+           stored f-values in fvals.'''
+        self.keyed = False
+        self.lifo = search_strategy == _DEPTH_FIRST
         if search_strategy == _DEPTH_FIRST:
             # use stack for OPEN set (last in---most recent successor added---is first out)
             self.open = []
@@ -210,63 +341,573 @@ class Open:
             self.open = deque()
             self.insert = self.open.append
             self.extract = self.open.popleft
+        elif (keyed and search_strategy in (_UCS, _BEST_FIRST, _ASTAR, _CUSTOM)) or \
+                search_strategy in (_ARA_STAR, _PEA_STAR):
+            # use priority queue of precomputed keys for OPEN. The node index
+            # breaks remaining ties so nodes are never compared directly.
+            self.open = []
+            self.keyed = True
+            key = _priority_key(search_strategy, weight, fvals)
+            self.key = key
+            heap = self.open
+            heappush = heapq.heappush
+            heappop = heapq.heappop
+            self.insert = lambda node: heappush(heap, (key(node), node.index, node))
+            self.extract = lambda: heappop(heap)[2]
         elif search_strategy == _UCS:
             # use priority queue for OPEN (first out is node with lowest gval)
             self.open = []
             # set node less than function to compare gvals only
-            sNode.lt_type = _G
-            self.insert = lambda node: heapq.heappush(self.open, node)
+            self.lt_type = _G
+            self.insert = self._push_node
             self.extract = lambda: heapq.heappop(self.open)
         elif search_strategy == _BEST_FIRST:
             # use priority queue for OPEN (first out is node with lowest hval)
             self.open = []
             # set node less than function to compare hvals only
-            sNode.lt_type = _H
-            self.insert = lambda node: heapq.heappush(self.open, node)
+            self.lt_type = _H
+            self.insert = self._push_node
             self.extract = lambda: heapq.heappop(self.open)
         elif search_strategy == _ASTAR:
             # use priority queue for OPEN (first out is node with lowest fval = gval+hval)
             self.open = []
             # set node less than function to compare sums of hval and gval
-            sNode.lt_type = _SUM_HG
-            self.insert = lambda node: heapq.heappush(self.open, node)
+            self.lt_type = _SUM_HG
+            self.insert = self._push_node
             self.extract = lambda: heapq.heappop(self.open)
         elif search_strategy == _CUSTOM:
             # use priority queue for OPEN (first out is node with lowest fval)
             self.open = []
             # set node less than function to compare sums of fval
-            sNode.lt_type = _C
-            self.insert = lambda node: heapq.heappush(self.open, node)
+            self.lt_type = _C
+            self.insert = self._push_node
             self.extract = lambda: heapq.heappop(self.open)
 
+    def _push_node(self, node):
+        # nodes on this OPEN are compared the way it needs, whatever
+        # other engines' OPEN sets need.
+        node.lt_type = self.lt_type
+        heapq.heappush(self.open, node)
+
     def empty(self):
         return not self.open
 
+    def __len__(self):
+        return len(self.open)
+
+    def nodes(self):
+        '''Return the nodes on OPEN (in storage order, not extraction order)'''
+        if self.keyed:
+            return [entry[-1] for entry in self.open]
+        return list(self.open)
+
+    def peek(self):
+        '''Return the node that extract would return next, without removing it'''
+        if self.keyed:
+            return self.open[0][2]
+        if self.lifo:
+            return self.open[-1]
+        return self.open[0]
+
+    def snapshot(self):
+        '''Return the entries on OPEN, for SearchEngine.checkpoint'''
+        return {'open': list(self.open)}
+
+    def restore(self, data):
+        '''Put back the entries of a snapshot on this (empty) OPEN'''
+        self.open.extend(data['open'])
+
     def print_open(self):
         print("{", end="")
-        if len(self.open) == 1:
-            print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(self.open[0].state.index, self.open[0].state.action,
-                                                                self.open[0].state.hashable_state(), self.open[0].gval,
-                                                                self.open[0].hval,
-                                                                self.open[0].gval + self.open[0].hval), end="")
-        else:
-            for nd in self.open:
-                print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(nd.state.index, nd.state.action,
-                                                                    nd.state.hashable_state(), nd.gval, nd.hval,
-                                                                    nd.gval + nd.hval), end="")
+        for nd in self.nodes():
+            print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(nd.state.index, nd.state.action,
+                                                                nd.state.hashable_state(), nd.gval, nd.hval,
+                                                                nd.gval + nd.hval), end="")
         print("}")
 
 
+class IndexedOpen:
+    '''A priority queue OPEN holding at most one node per state. The
+       heap is indexed by the state's key (hashable_state() unless the
+       engine uses canonical keys), so when a state already on OPEN is
+       reached again via a cheaper path its node is replaced in place
+       (decrease-key) instead of a duplicate node being pushed and later
+       skipped as stale. Only the priority queue
+       strategies (ucs, best_first, astar and custom) can use it.'''
+
+    def __init__(self, search_strategy, state_key=_hashable_key):
+        # heap entries are [key, node index, node, state key]
+        self.open = []
+        self.state_key = state_key
+        self.position = dict()
+        self.keyed = True
+        self.key = _priority_key(search_strategy)
+        # counts of the duplicate inserts (and hence the later stale
+        # pops) avoided by updating or keeping the existing entry.
+        self.decrease_keys = 0
+        self.duplicates_dropped = 0
+
+    def insert(self, node):
+        hash_state = self.state_key(node.state)
+        pos = self.position.get(hash_state)
+        if pos is None:
+            self.open.append([self.key(node), node.index, node, hash_state])
+            self._sift_up(len(self.open) - 1)
+            return
+        entry = self.open[pos]
+        if node.gval >= entry[2].gval:
+            self.duplicates_dropped = self.duplicates_dropped + 1
+            return
+        old_key = entry[0]
+        entry[0] = self.key(node)
+        entry[1] = node.index
+        entry[2] = node
+        self.decrease_keys = self.decrease_keys + 1
+        # with the custom strategy a cheaper path need not lower the key
+        if entry[0] < old_key:
+            self._sift_up(pos)
+        else:
+            self._sift_down(pos)
+
+    def extract(self):
+        heap = self.open
+        last = heap.pop()
+        if heap:
+            entry = heap[0]
+            heap[0] = last
+            self.position[last[3]] = 0
+            self._sift_down(0)
+        else:
+            entry = last
+        del self.position[entry[3]]
+        return entry[2]
+
+    def _sift_up(self, pos):
+        heap = self.open
+        position = self.position
+        entry = heap[pos]
+        while pos > 0:
+            parent_pos = (pos - 1) >> 1
+            parent = heap[parent_pos]
+            if not entry < parent:
+                break
+            heap[pos] = parent
+            position[parent[3]] = pos
+            pos = parent_pos
+        heap[pos] = entry
+        position[entry[3]] = pos
+
+    def _sift_down(self, pos):
+        heap = self.open
+        position = self.position
+        size = len(heap)
+        entry = heap[pos]
+        while True:
+            child_pos = 2 * pos + 1
+            if child_pos >= size:
+                break
+            right_pos = child_pos + 1
+            if right_pos < size and heap[right_pos] < heap[child_pos]:
+                child_pos = right_pos
+            child = heap[child_pos]
+            if not child < entry:
+                break
+            heap[pos] = child
+            position[child[3]] = pos
+            pos = child_pos
+        heap[pos] = entry
+        position[entry[3]] = pos
+
+    def empty(self):
+        return not self.open
+
+    def __len__(self):
+        return len(self.open)
+
+    def nodes(self):
+        '''Return the nodes on OPEN (in storage order, not extraction order)'''
+        return [entry[2] for entry in self.open]
+
+    def peek(self):
+        '''Return the node that extract would return next, without removing it'''
+        return self.open[0][2]
+
+    def snapshot(self):
+        '''Return the entries on OPEN and its counts, for SearchEngine.checkpoint'''
+        return {'open': list(self.open), 'decrease_keys': self.decrease_keys,
+                'duplicates_dropped': self.duplicates_dropped}
+
+    def restore(self, data):
+        '''Put back the entries of a snapshot on this (empty) OPEN'''
+        self.open.extend(data['open'])
+        for pos, entry in enumerate(self.open):
+            self.position[entry[3]] = pos
+        self.decrease_keys = data['decrease_keys']
+        self.duplicates_dropped = data['duplicates_dropped']
+
+    print_open = Open.print_open
+
+
+class BeamOpen:
+    '''OPEN for beam search. The nodes inserted while one layer is being
+       expanded are the candidates for the next layer. Once the current
+       layer is used up only the width best candidates, ordered by their
+       fval_function (h by default), become the next layer and the rest
+       are dropped.'''
+
+    def __init__(self, width):
+        self.width = width
+        self.keyed = True
+        self.key = lambda node: (node.fval_function(node),)
+        # the current layer, best entry last, and the next layer's
+        # candidates, as (key, node index, node) entries.
+        self.layer = []
+        self.candidates = []
+        self.dropped = 0
+        self.peak_layer = 1
+
+    def insert(self, node):
+        self.candidates.append((self.key(node), node.index, node))
+
+    def extract(self):
+        if not self.layer:
+            self._next_layer()
+        return self.layer.pop()[2]
+
+    def _next_layer(self):
+        best = heapq.nsmallest(self.width, self.candidates)
+        self.dropped = self.dropped + len(self.candidates) - len(best)
+        best.reverse()
+        self.layer = best
+        self.candidates = []
+        if len(best) > self.peak_layer:
+            self.peak_layer = len(best)
+
+    def empty(self):
+        return not self.layer and not self.candidates
+
+    def __len__(self):
+        return len(self.layer) + len(self.candidates)
+
+    def nodes(self):
+        '''Return the nodes on OPEN (in storage order, not extraction order)'''
+        return [entry[2] for entry in self.layer + self.candidates]
+
+    def peek(self):
+        '''Return the node that extract would return next, without removing it'''
+        if self.layer:
+            return self.layer[-1][2]
+        return min(self.candidates)[2]
+
+    def snapshot(self):
+        '''Return the layer, the candidates and the counts, for SearchEngine.checkpoint'''
+        return {'layer': list(self.layer), 'candidates': list(self.candidates), 'dropped': self.dropped,
+                'peak_layer': self.peak_layer}
+
+    def restore(self, data):
+        '''Put back the entries of a snapshot on this (empty) OPEN'''
+        self.layer = data['layer']
+        self.candidates = data['candidates']
+        self.dropped = data['dropped']
+        self.peak_layer = data['peak_layer']
+
+    print_open = Open.print_open
+
+
+class _SMAEntry:
+    '''A node held in memory by sma_star, see SearchEngine._searchSMA.'''
+    __slots__ = ('node', 'key', 'parent', 'fval', 'children', 'forgotten', 'on_open', 'alive', 'push')
+
+    def __init__(self, node, key, parent, fval):
+        self.node = node
+        # the state key of the node, and its parent entry (None for the root)
+        self.key = key
+        self.parent = parent
+        # the backed up f-value
+        self.fval = fval
+        # the children in memory by state key, and the smallest f-value of
+        # the children that were evicted
+        self.children = dict()
+        self.forgotten = float("inf")
+        self.on_open = False
+        self.alive = True
+        # the number of the entry's latest push onto OPEN; older heap
+        # entries for it are ignored.
+        self.push = 0
+
+
+class SearchStats:
+    '''A record of the work done by a SearchEngine since init_search, as
+       returned by SearchEngine.search(..., return_stats=True) or
+       SearchEngine.get_stats(). The depth histogram maps each depth (the
+       number of actions from the initial state) to the number of nodes
+       expanded at that depth. Times are in seconds and only count time
+       spent in search(). For the bounded memory strategies budget is the
+       beam width or node budget, budget_used the largest beam or number
+       of nodes held, and evicted the number of nodes dropped to stay
+       within the budget. dead_pruned counts the successors dropped by the
+       successor filter, and table_lookups and table_hits count the
+       heuristic lookups made in, and answered by, a SolvedTable.
+       heuristic_cache_hits and heuristic_cache_misses count the heuristic
+       calls answered by, and passed on by, the heuristic cache.
+       checkpoints and checkpoint_time are the number of checkpoints
+       written and the time spent writing them. With the 'indexed'
+       frontier, decrease_keys and duplicates_dropped count the nodes that
+       replaced, or were dropped in favour of, a node already on OPEN for
+       their state, which the other frontiers push and later count in
+       stale_pruned.'''
+
+    FIELDS = ('strategy', 'solved', 'solution_cost', 'expanded', 'generated', 'cycle_check_pruned',
+              'cost_bound_pruned', 'stale_pruned', 'decrease_keys', 'duplicates_dropped', 'dead_pruned',
+              'peak_open', 'peak_cc_dictionary', 'budget', 'budget_used', 'evicted', 'table_lookups',
+              'table_hits', 'heuristic_cache_hits', 'heuristic_cache_misses', 'checkpoints',
+              'checkpoint_time', 'wall_time', 'cpu_time', 'depth_histogram')
+
+    def __init__(self):
+        self.strategy = None
+        self.solved = False
+        self.solution_cost = None
+        self.expanded = 0
+        self.generated = 0
+        self.cycle_check_pruned = 0
+        self.cost_bound_pruned = 0
+        self.stale_pruned = 0
+        self.decrease_keys = 0
+        self.duplicates_dropped = 0
+        self.dead_pruned = 0
+        self.peak_open = 0
+        self.peak_cc_dictionary = 0
+        self.budget = None
+        self.budget_used = None
+        self.evicted = 0
+        self.table_lookups = 0
+        self.table_hits = 0
+        self.heuristic_cache_hits = 0
+        self.heuristic_cache_misses = 0
+        self.checkpoints = 0
+        self.checkpoint_time = 0.
+        self.wall_time = 0.
+        self.cpu_time = 0.
+        self.depth_histogram = dict()
+
+    def to_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+    def to_json(self):
+        '''Return the record as a JSON object. JSON keys are strings, so the
+           depth histogram's depths become strings; from_json reverses this.'''
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, values):
+        stats = cls()
+        for field in cls.FIELDS:
+            if field in values:
+                setattr(stats, field, values[field])
+        stats.depth_histogram = dict((int(depth), count) for depth, count in stats.depth_histogram.items())
+        return stats
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+
+class HeuristicCache:
+    '''A memo of heuristic values keyed by hashable_state(), holding at
+       most capacity states and evicting the least recently used state
+       when full. Calling the cache returns heur_fn(state), computing it
+       only on a miss. See SearchEngine.set_heuristic_cache.'''
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.heur_fn = None
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def set_heuristic(self, heur_fn):
+        '''Cache the values of heur_fn, forgetting any values cached for a
+           different heuristic.'''
+        if heur_fn is not self.heur_fn:
+            self.heur_fn = heur_fn
+            self.values.clear()
+
+    def set_capacity(self, capacity):
+        '''Change the capacity, evicting the least recently used states
+           beyond it.'''
+        self.capacity = capacity
+        values = self.values
+        while len(values) > capacity:
+            values.popitem(last=False)
+
+    def __call__(self, state):
+        key = state.hashable_state()
+        values = self.values
+        hval = values.get(key)
+        if hval is not None:
+            self.hits = self.hits + 1
+            values.move_to_end(key)
+            return hval
+        self.misses = self.misses + 1
+        hval = self.heur_fn(state)
+        values[key] = hval
+        while len(values) > self.capacity:
+            values.popitem(last=False)
+        return hval
+
+    def __len__(self):
+        return len(self.values)
+
+
+class SolvedTable:
+    '''A persistent table of proven costs-to-go (h* values), kept in a
+       shelve file at path and keyed by canonical_state(), so one entry
+       serves every state equal up to the problem's symmetries, or by
+       hashable_state() with key='hashable' when canonical states are too
+       expensive to compute for every heuristic lookup. Each entry
+       also holds the hashable_state() and the remaining actions of the
+       solution path it was recorded from, which lets a search reaching
+       that exact state replay the rest of the path instead of searching.
+
+       Calling the table returns a state's h* if it is known and
+       heur_fn(state) otherwise. See SearchEngine.set_solved_table.'''
+
+    def __init__(self, path, key='canonical'):
+        if not key in ['canonical', 'hashable']:
+            print('Unknown state key specified:', key)
+            print("Must be one of ['canonical', 'hashable']")
+            key = 'canonical'
+        self.path = path
+        self.state_key = _canonical_key if key == 'canonical' else _hashable_key
+        self.shelf = shelve.open(path)
+        self.heur_fn = None
+        # h* by repr(state key), the shelf's keys, and (h*, remaining
+        # actions) by hashable state, loaded from the shelf.
+        self.values = dict()
+        self.paths = dict()
+        for key, (hval, hash_state, actions) in self.shelf.items():
+            self.values[key] = hval
+            self.paths[hash_state] = (hval, actions)
+        self.lookups = 0
+        self.hits = 0
+
+    def set_heuristic(self, heur_fn):
+        '''Use heur_fn for the states that are not in the table.'''
+        self.heur_fn = heur_fn
+
+    def __call__(self, state):
+        self.lookups = self.lookups + 1
+        hval = self.values.get(repr(self.state_key(state)))
+        if hval is None:
+            return self.heur_fn(state)
+        self.hits = self.hits + 1
+        return hval
+
+    def __len__(self):
+        return len(self.values)
+
+    def record(self, goal_state):
+        '''Record the h* of every state on the path to goal_state, which
+           must be an optimal solution. Returns the number of new entries.'''
+        added = 0
+        actions = []
+        state = goal_state
+        while state is not None:
+            key = repr(self.state_key(state))
+            hval = goal_state.gval - state.gval
+            if self.values.get(key) != hval:
+                added = added + 1
+                self.values[key] = hval
+                hash_state = state.hashable_state()
+                self.paths[hash_state] = (hval, tuple(reversed(actions)))
+                self.shelf[key] = (hval, hash_state, tuple(reversed(actions)))
+            actions.append(state.action)
+            state = state.parent
+        self.shelf.sync()
+        return added
+
+    def shortcut(self, node, goal_fn):
+        '''If a solution path was recorded from node's state and node's h is
+           that path's cost, return the goal node reached by replaying it,
+           otherwise return None.'''
+        entry = self.paths.get(node.state.hashable_state())
+        if entry is None or entry[0] != node.hval:
+            return None
+        state = node.state
+        for action in entry[1]:
+            for succ in state.successors():
+                if succ.action == action:
+                    state = succ
+                    break
+            else:
+                return None
+        if not goal_fn(state):
+            return None
+        return sNode(state, 0, node.fval_function, node.depth + len(entry[1]))
+
+    def close(self):
+        self.shelf.close()
+
+
 class SearchEngine:
-    def __init__(self, strategy='depth_first', cc_level='default'):
+    def __init__(self, strategy='depth_first', cc_level='default', frontier='keyed'):
         self.set_strategy(strategy, cc_level)
+        self.set_frontier(frontier)
+        self.set_state_key('hashable')
+        self.heuristic_cache = None
+        self.solved_table = None
+        self.successor_filter = None
+        self.progress_callback = None
+        self.progress_interval = 1.
+        self.beam_width = 100
+        self.node_budget = 100000
+        self.admissible = False
+        self.checkpoint_path = None
+        self.checkpoint_interval = 60.
+        self.checkpoint_overhead = 0.05
         self.trace = 0
 
     def initStats(self):
-        sNode.n = 0
-        StateSpace.n = 1  # initial state already generated on call so search
+        # the states and nodes created by this engine's searches are
+        # numbered by the engine, see _SearchContext.
+        self.node_count = 0
+        self.state_count = 1  # initial state already generated on call so search
         self.cycle_check_pruned = 0
         self.cost_bound_pruned = 0
+        # nodes extracted from OPEN but skipped because a cheaper path to
+        # their state had already been found (lazy full cycle checking).
+        self.stale_pruned = 0
+        # successors dropped by the successor filter as provably dead.
+        self.dead_pruned = 0
+        # work done by this engine: nodes expanded, successor states
+        # generated and the largest size reached by OPEN (by the current
+        # path for the iterative deepening strategies).
+        self.expanded = 0
+        self.generated = 0
+        self.peak_open = 1
+        # successors left off OPEN by pea_star because their f-value
+        # exceeded their parent's current f-value.
+        self.pea_deferred = 0
+        # nodes expanded at each depth, and the wall clock and CPU time
+        # spent in search() since init_search.
+        self.depth_histogram = dict()
+        self.wall_time = 0.
+        self.cpu_time = 0.
+        # the time search() was called, while it is running.
+        self.search_start_time = None
+        # nodes evicted by sma_star to stay within its node budget.
+        self.evicted = 0
+        # checkpoints written since init_search and the time spent on them.
+        self.checkpoints = 0
+        self.checkpoint_time = 0.
+        # heuristic cache lookups in this search (the cached values
+        # themselves are kept between searches).
+        if self.heuristic_cache is not None:
+            self.heuristic_cache.hits = 0
+            self.heuristic_cache.misses = 0
+        if self.solved_table is not None:
+            self.solved_table.lookups = 0
+            self.solved_table.hits = 0
 
     def trace_on(self, level=1):
         '''For debugging, set tracking level 1 or 2'''
@@ -277,16 +918,25 @@ class SearchEngine:
         self.trace = 0
 
     def set_strategy(self, s, cc='default'):
-        if not s in ['depth_first', 'breadth_first', 'ucs', 'best_first', 'astar', 'custom']:
+        if not s in ['depth_first', 'breadth_first', 'ucs', 'best_first', 'astar', 'custom', 'ida_star', 'iddfs',
+                     'ara_star', 'pea_star', 'beam', 'sma_star']:
             print('Unknown search strategy specified:', s)
-            print("Must be one of 'depth_first', 'ucs', 'breadth_first', 'best_first', 'custom' or 'astar'")
+            print("Must be one of 'depth_first', 'ucs', 'breadth_first', 'best_first', 'custom', 'astar', "
+                  "'ida_star', 'iddfs', 'ara_star', 'pea_star', 'beam' or 'sma_star'")
         elif not cc in ['default', 'none', 'path', 'full']:
             print('Unknown cycle check level', cc)
             print("Must be one of ['default', 'none', 'path', 'full']")
 
         else:
+            if s in ['ida_star', 'iddfs', 'sma_star'] and cc == 'full':
+                print("Full cycle checking is not available for {}, using path checking".format(s))
+                cc = 'path'
+            if s == 'ara_star' and cc in ['none', 'path']:
+                print("ara_star requires full cycle checking, using full cycle checking")
+                cc = 'full'
+
             if cc == 'default':
-                if s == 'depth_first':
+                if s in ['depth_first', 'ida_star', 'iddfs', 'sma_star']:
                     self.cycle_check = _CC_PATH
                 else:
                     self.cycle_check = _CC_FULL
@@ -309,6 +959,127 @@ class SearchEngine:
                 self.strategy = _ASTAR
             elif s == 'custom':
                 self.strategy = _CUSTOM
+            elif s == 'ida_star':
+                self.strategy = _IDA_STAR
+            elif s == 'iddfs':
+                self.strategy = _IDDFS
+            elif s == 'ara_star':
+                self.strategy = _ARA_STAR
+            elif s == 'pea_star':
+                self.strategy = _PEA_STAR
+            elif s == 'beam':
+                self.strategy = _BEAM
+            elif s == 'sma_star':
+                self.strategy = _SMA_STAR
+
+    def set_frontier(self, frontier):
+        '''Select how the priority queue strategies store OPEN.
+           'keyed' computes each node's priority once on insertion,
+           'node' orders the nodes themselves with sNode.__lt__ and
+           'indexed' keeps one keyed node per state on OPEN, replacing
+           it with decrease-key when a cheaper path is found (the other
+           modes handle this lazily, see init_search).'''
+        if not frontier in ['keyed', 'node', 'indexed']:
+            print('Unknown frontier specified:', frontier)
+            print("Must be one of ['keyed', 'node', 'indexed']")
+        else:
+            self.frontier = frontier
+
+    def set_state_key(self, key):
+        '''Select the key identifying states in full cycle checking.
+           'hashable' uses hashable_state(); 'canonical' uses
+           canonical_state(), so states equivalent under the problem's
+           symmetries share one cc_dictionary entry. Paths are always made
+           of the states actually generated.'''
+        if not key in ['hashable', 'canonical']:
+            print('Unknown state key specified:', key)
+            print("Must be one of ['hashable', 'canonical']")
+        else:
+            self.state_key = _canonical_key if key == 'canonical' else _hashable_key
+
+    def set_heuristic_cache(self, capacity=None):
+        '''Memoise heuristic values, by hashable_state(), for up to capacity
+           states, evicting the least recently used. The cached values are
+           kept by later calls to init_search with the same heuristic
+           function. A capacity of None or 0 turns the cache off.'''
+        if not capacity:
+            self.heuristic_cache = None
+        elif self.heuristic_cache is None:
+            self.heuristic_cache = HeuristicCache(capacity)
+        else:
+            self.heuristic_cache.set_capacity(capacity)
+
+    def set_solved_table(self, table=None):
+        '''Consult a SolvedTable, or None for no table, in later searches.
+           Its h* values are used in place of heur_fn wherever they are
+           known, and astar returns at once when it extracts a state whose
+           recorded solution path it can replay. The first solution found
+           by ucs, astar or ida_star without a cost bound is recorded in the
+           table, so heur_fn must be admissible for the recorded values to
+           be exact.'''
+        self.solved_table = table
+
+    def set_successor_filter(self, prune_fn=None):
+        '''Drop every successor state for which prune_fn(state) is True
+           as soon as it is generated, before it is hashed, evaluated by
+           heur_fn or put on OPEN. prune_fn must only return True for
+           states from which no goal can be reached (see for example
+           lunarlockout.lockout_dead_state); such states are counted in
+           dead_pruned rather than cycle_check_pruned. A prune_fn of None
+           turns the filter off.'''
+        self.successor_filter = prune_fn
+
+    def set_beam_width(self, width):
+        '''Set the number of nodes kept in each layer by beam search
+           (default 100). It takes effect at the next init_search.'''
+        self.beam_width = max(1, width)
+
+    def set_node_budget(self, budget):
+        '''Set the number of nodes sma_star may hold in memory (default
+           100000). It takes effect at the next init_search.'''
+        self.node_budget = max(2, budget)
+
+    def set_admissible_heuristic(self, admissible=True):
+        '''Declare whether the heuristic functions given to init_search are
+           admissible. ara_star prunes the nodes that can not lead to a goal
+           cheaper than its incumbent: by g alone by default, and by g + h
+           once the heuristic is declared admissible, which prunes more but
+           can lose better solutions if h overestimates.'''
+        self.admissible = admissible
+
+    def set_checkpoint(self, path=None, interval=60., max_overhead=0.05):
+        '''Write a checkpoint of the search to path (see checkpoint) about
+           every interval seconds while searching. The next checkpoint is
+           put off further if need be, so that the time spent on the
+           checkpoints of a search (estimating the cost of the next one
+           from the last one, see _checkpointAffordable) stays within the
+           fraction max_overhead of the time since search was called.
+           Only the strategies that keep an OPEN set (depth_first,
+           breadth_first, ucs, best_first, astar, custom and beam) are
+           checkpointed. A path of None turns checkpoints off.'''
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval
+        self.checkpoint_overhead = max_overhead
+
+    def set_progress_callback(self, callback=None, interval=1.):
+        '''Call callback(progress) about every interval seconds while searching.
+           progress is a dictionary with the search's elapsed (wall clock)
+           time, the nodes expanded and states generated so far, the nodes
+           expanded per second since the last report, the size of OPEN
+           (None for ida_star and iddfs), the best f-value (g + h of the next
+           node on OPEN, or the threshold of the current ida_star or iddfs
+           iteration) and the cycle check hit rate (the fraction of the
+           generated states pruned by cycle checking). A callback of None
+           turns progress reports off.'''
+        self.progress_callback = callback
+        self.progress_interval = interval
+
+    def get_heuristic_cache_stats(self):
+        '''Return (hits, misses) of the heuristic cache in the current
+           search, or None if there is no heuristic cache.'''
+        if self.heuristic_cache is None:
+            return None
+        return self.heuristic_cache.hits, self.heuristic_cache.misses
 
     def get_strategy(self):
         if self.strategy == _DEPTH_FIRST:
@@ -323,6 +1094,18 @@ class SearchEngine:
             rval = 'astar'
         elif self.strategy == _CUSTOM:
             rval = 'custom'
+        elif self.strategy == _IDA_STAR:
+            rval = 'ida_star'
+        elif self.strategy == _IDDFS:
+            rval = 'iddfs'
+        elif self.strategy == _ARA_STAR:
+            rval = 'ara_star'
+        elif self.strategy == _PEA_STAR:
+            rval = 'pea_star'
+        elif self.strategy == _BEAM:
+            rval = 'beam'
+        elif self.strategy == _SMA_STAR:
+            rval = 'sma_star'
 
         rval = rval + ' with '
 
@@ -335,15 +1118,31 @@ class SearchEngine:
 
         return rval
 
-    def init_search(self, initState, goal_fn, heur_fn=_zero_hfn, fval_function=_fval_function):
+    def init_search(self, initState, goal_fn, heur_fn=_zero_hfn, fval_function=_fval_function, weight=1.,
+                    weight_step=1.):
         """
         Get ready to search. Call search on this object to run the search.
 
         @param initState: the state of the puzzle to start the search from.
         @param goal_fn: the goal function for the puzzle
-        @param heur_fn: the heuristic function to use (only relevant for search strategies that use heuristics)
+        @param heur_fn: the heuristic function to use (only relevant for search strategies that use heuristics).
+                        If heur_fn has a batch attribute, heur_fn.batch(states) must return the list of heur_fn's
+                        values for a list of states; the depth_first, breadth_first, ucs, best_first, astar, custom
+                        and beam searches then make one batch call per expansion, for the successors that pass
+                        the successor filter, the cycle checks and the bound table (unless a heuristic cache or
+                        solved table is in use).
         @param fval_fn: the f-value function (only relevant for custom search strategy)
+        @param weight: the initial weight on h (only relevant for ara_star)
+        @param weight_step: how much the weight drops after each ara_star solution (only relevant for ara_star)
         """
+        previous = _context.engine
+        _context.engine = self
+        try:
+            self._init_search(initState, goal_fn, heur_fn, fval_function, weight, weight_step)
+        finally:
+            _context.engine = previous
+
+    def _init_search(self, initState, goal_fn, heur_fn, fval_function, weight, weight_step):
         # Perform full cycle checking as follows
         # a. check state before inserting into OPEN. If we had already reached
         #   the same state via a cheaper path, don't insert into OPEN.
@@ -353,8 +1152,11 @@ class SearchEngine:
         #   and if we have already expanded that state via a cheaper path
         #   we don't expand it. If we had expanded the state via a more
         #   expensive path, we re-expand it.
+        #   With the 'indexed' frontier the older node is instead replaced
+        #   on OPEN, so no stale node is ever extracted.
 
         self.initStats()
+        self.cc_dictionary = None
 
         # BEGIN TRACING
         if self.trace:
@@ -362,52 +1164,438 @@ class SearchEngine:
             print("   TRACE: Initial State:", end="")
             initState.print_state()
         # END
-        self.open = Open(self.strategy)
+        # the batch form of heur_fn, if it has one, see _searchOpen.
+        self.heur_batch = getattr(heur_fn, 'batch', None)
+        if self.heuristic_cache is not None or self.solved_table is not None:
+            self.heur_batch = None
+        if self.heuristic_cache is not None:
+            self.heuristic_cache.set_heuristic(heur_fn)
+            heur_fn = self.heuristic_cache
+        if self.solved_table is not None:
+            self.solved_table.set_heuristic(heur_fn)
+            heur_fn = self.solved_table
+        # only the first solution of an optimal strategy is recorded in
+        # the solved table.
+        self.record_solution = self.strategy in (_UCS, _ASTAR, _IDA_STAR)
+
+        self.fval_function = fval_function
+        self.goal_fn = goal_fn
+        self.heur_fn = heur_fn
 
         node = sNode(initState, heur_fn(initState), fval_function)
 
+        if self.strategy in (_IDA_STAR, _IDDFS):
+            # iterative deepening keeps no OPEN set or cc_dictionary. Each
+            # iteration's threshold and node counts are recorded in
+            # self.iterations.
+            self.open = None
+            self.iterations = []
+            self.iterative_search = self._searchIterative(node)
+            return
+
+        if self.strategy == _SMA_STAR:
+            # sma_star keeps its own tree of _SMAEntry nodes: OPEN ordered
+            # by f-value and a heap of the leaves ordered worst first.
+            self.open = None
+            self.iterations = []
+            self.sma_open = []
+            self.sma_leaves = []
+            self.sma_pushes = 0
+            self.sma_alive = 1
+            # the number of entries on OPEN, less the stale heap entries
+            self.sma_on_open = 0
+            self.budget_used = 1
+            self._smaPush(_SMAEntry(node, self.state_key(initState), None, node.gval + node.hval))
+            return
+
+        if self.strategy == _ARA_STAR:
+            # ara_star state carried across weight decreases: the states
+            # expanded at the current weight, the INCONS list of closed
+            # states reached again more cheaply, and the best goal so far.
+            self.weight = max(weight, 1.)
+            self.weight_step = weight_step
+            self.closed = set()
+            self.incons = dict()
+            self.incumbent = None
+            self.improvements = []
+            self.open = Open(self.strategy, weight=self.weight)
+        elif self.strategy == _PEA_STAR:
+            # (F, F_prev) of the nodes put back on OPEN by pea_star, by
+            # node index.
+            self.pea_fvals = dict()
+            self.open = Open(self.strategy, fvals=self.pea_fvals)
+        else:
+            self.open = self._newOpen()
+
+        # depth-first path checking maintains the current path incrementally
+        # (see _searchOpen); other strategies walk the parent chain.
+        if self.strategy == _DEPTH_FIRST and self.cycle_check == _CC_PATH:
+            self.path_states = []
+            self.path_keys = []
+            self.path_set = set()
+        else:
+            self.path_states = None
+            self.path_keys = None
+            self.path_set = None
+
         # the cycle check dictionary stores the cheapest path (g-val) found
         # so far to a state.
         if self.cycle_check == _CC_FULL:
             self.cc_dictionary = dict()
-            self.cc_dictionary[initState.hashable_state()] = initState.gval
+            self.cc_dictionary[self.state_key(initState)] = initState.gval
+
+        # the bound table stores, for states pruned by the cost bound, the
+        # smallest g-value with which they were pruned. As long as the cost
+        # bound is not loosened any later path to such a state that is no
+        # cheaper is pruned again, so it is skipped without computing h.
+        self.bound_table = dict()
+        self.bound_table_costbound = None
 
         self.open.insert(node)
-        self.fval_function = fval_function
-        self.goal_fn = goal_fn
-        self.heur_fn = heur_fn
 
-    def search(self, timebound=None, costbound=None):
+    def _newOpen(self):
+        '''Return an empty OPEN for the depth_first, breadth_first, ucs, best_first, astar, custom or beam strategy.'''
+        if self.strategy == _BEAM:
+            return BeamOpen(self.beam_width)
+        if self.frontier == 'indexed' and self.strategy in (_UCS, _BEST_FIRST, _ASTAR, _CUSTOM):
+            return IndexedOpen(self.strategy, self.state_key)
+        return Open(self.strategy, self.frontier != 'node')
+
+    def search(self, timebound=None, costbound=None, return_stats=False):
         """
         Start searching, using the parameters set by init_search.
 
         @param timebound: the maximum amount of time, in seconds, to spend on this search.
         @param costbound: the cost bound 3-tuple for pruning, as specified in the assignment.
+        @param return_stats: if True return a (goal state or False, SearchStats) pair instead of the goal state or False.
         """
-
+        previous = _context.engine
+        _context.engine = self
+        try:
+            return self._search(timebound, costbound, return_stats)
+        finally:
+            _context.engine = previous
+
+    def _search(self, timebound, costbound, return_stats):
         goal_node = []
 
         ###NOW do the search and return the result
-        self.search_start_time = os.times()[0]
+        # the time bound is a monotonic wall clock deadline, checked by
+        # _deadline_reached.
+        self.search_start_time = time.monotonic()
+        self.search_start_cpu = time.process_time()
         self.search_stop_time = None
         if timebound:
             self.search_stop_time = self.search_start_time + timebound
-        goal_node = self._searchOpen(self.goal_fn, self.heur_fn, self.fval_function, costbound)
-
-        if goal_node:
-            total_search_time = os.times()[0] - self.search_start_time
-            # print("Solution Found with cost of {} in search time of {} sec".format(goal_node.gval, total_search_time))
-            # print("Nodes expanded = {}, states generated = {}, states cycle check pruned = {}, states cost bound pruned = {}".format(
-            #    sNode.n, StateSpace.n, self.cycle_check_pruned, self.cost_bound_pruned))
-            return goal_node.state
+        self.check_interval = 1
+        self.check_countdown = 1
+        self.last_check_time = self.search_start_time
+        self.last_progress_time = self.search_start_time
+        self.last_progress_expanded = self.expanded
+        # set by _deadline_reached when a checkpoint is due; _searchOpen
+        # writes it before taking the next node off OPEN.
+        self.checkpoint_due = False
+        self.next_checkpoint_time = None
+        self.search_checkpoint_time = 0.
+        self.last_checkpoint_cost = None
+        if self.checkpoint_path is not None and self._checkpointable():
+            self.next_checkpoint_time = self.search_start_time + self.checkpoint_interval
+        if self.strategy == _SMA_STAR:
+            goal_node = self._searchSMA(self.goal_fn, self.heur_fn, costbound)
+        elif self.open is None:
+            self.costbound = costbound
+            goal_node = next(self.iterative_search, False)
+        elif self.strategy == _ARA_STAR:
+            goal_node = self._searchARA(self.goal_fn, self.heur_fn, costbound)
+        elif self.strategy == _PEA_STAR:
+            goal_node = self._searchPEA(self.goal_fn, self.heur_fn, costbound)
         else:
-            # exited the while without finding goal---search failed
-            total_search_time = os.times()[0] - self.search_start_time
-            # print("Search Failed! No solution found.")
-            # print("Nodes expanded = {}, states generated = {}, states cycle check pruned = {}, states cost bound pruned = {}".format(
-            #    sNode.n, StateSpace.n, self.cycle_check_pruned, self.cost_bound_pruned))
+            if self.bound_table_costbound is not None and (
+                    costbound is None or any(new > old for new, old in zip(costbound, self.bound_table_costbound))):
+                self.bound_table = dict()
+            self.bound_table_costbound = costbound
+            goal_node = self._searchOpen(self.goal_fn, self.heur_fn, self.fval_function, costbound)
+
+        self.wall_time = self.wall_time + time.monotonic() - self.search_start_time
+        self.cpu_time = self.cpu_time + time.process_time() - self.search_start_cpu
+        self.search_start_time = None
+        result = goal_node.state if goal_node else False
+        if self.solved_table is not None and result and self.record_solution and costbound is None:
+            self.solved_table.record(result)
+        if result:
+            self.record_solution = False
+        stats = self.get_stats(result) if return_stats or self.trace else None
+
+        # BEGIN TRACING
+        if self.trace:
+            if result:
+                print("   TRACE: Solution Found with cost of {} in search time of {} sec".format(
+                    result.gval, stats.wall_time))
+            else:
+                # exited the while without finding goal---search failed
+                print("   TRACE: Search Failed! No solution found.")
+            print("   TRACE: Nodes expanded = {}, states generated = {}, states cycle check pruned = {}, "
+                  "states cost bound pruned = {}".format(stats.expanded, stats.generated, stats.cycle_check_pruned,
+                                                         stats.cost_bound_pruned))
+        # END TRACING
+
+        if return_stats:
+            return result, stats
+        return result
+
+    def get_stats(self, goal_state=False):
+        '''Return a SearchStats record of the work done since init_search.
+           goal_state is the last state returned by search, if any.'''
+        stats = SearchStats()
+        stats.strategy = self.get_strategy()
+        stats.solved = bool(goal_state)
+        stats.solution_cost = goal_state.gval if goal_state else None
+        stats.expanded = self.expanded
+        stats.generated = self.generated
+        stats.cycle_check_pruned = self.cycle_check_pruned
+        stats.cost_bound_pruned = self.cost_bound_pruned
+        stats.stale_pruned = self.stale_pruned
+        stats.dead_pruned = self.dead_pruned
+        stats.peak_open = self.peak_open
+        # entries are never removed from the cycle check dictionary
+        stats.peak_cc_dictionary = len(self.cc_dictionary) if self.cc_dictionary is not None else 0
+        if isinstance(self.open, IndexedOpen):
+            stats.decrease_keys = self.open.decrease_keys
+            stats.duplicates_dropped = self.open.duplicates_dropped
+        if self.strategy == _BEAM:
+            stats.budget = self.open.width
+            stats.budget_used = self.open.peak_layer
+            stats.evicted = self.open.dropped
+        elif self.strategy == _SMA_STAR:
+            stats.budget = self.node_budget
+            stats.budget_used = self.budget_used
+            stats.evicted = self.evicted
+        if self.solved_table is not None:
+            stats.table_lookups = self.solved_table.lookups
+            stats.table_hits = self.solved_table.hits
+        if self.heuristic_cache is not None:
+            stats.heuristic_cache_hits = self.heuristic_cache.hits
+            stats.heuristic_cache_misses = self.heuristic_cache.misses
+        stats.checkpoints = self.checkpoints
+        stats.checkpoint_time = self.checkpoint_time
+        stats.wall_time = self.wall_time
+        stats.cpu_time = self.cpu_time
+        stats.depth_histogram = dict(sorted(self.depth_histogram.items()))
+        return stats
+
+    def _checkpointable(self):
+        '''Return True if the search can be checkpointed, see checkpoint.'''
+        return self.open is not None and self.strategy not in (_ARA_STAR, _PEA_STAR)
+
+    def checkpoint(self, path):
+        '''
+        Save the search to a checkpoint file, from which SearchEngine.resume continues it exactly where it stopped.
+        Call it before search, or after search has returned a goal (the search then resumes past that goal).
+
+        The file holds OPEN, the cycle check dictionary, the counters and the strategy settings, but no functions:
+        the goal, heuristic and f-value functions are given to resume again. Each state reached by a node on OPEN
+        is saved once, without its parent, with the position of its parent in a list, so states shared by several
+        paths are not repeated and long paths do not exhaust pickle's recursion limit. The file is written next
+        to path and then renamed, so a search stopped while writing leaves the previous checkpoint in place.
+
+        @param path: the checkpoint file.
+        @return: True, or False if the strategy can not be checkpointed.
+        '''
+        if not self._checkpointable():
+            print("Checkpoints are not available for", self.get_strategy())
+            return False
+
+        # number the states on the paths to the nodes on OPEN (and on the
+        # current depth-first path), each once.
+        nodes = self.open.nodes()
+        roots = [node.state for node in nodes]
+        if self.path_states is not None:
+            roots.extend(self.path_states)
+        positions = dict()
+        states = []
+        for state in roots:
+            while state is not None and id(state) not in positions:
+                positions[id(state)] = len(states)
+                states.append(state)
+                state = state.parent
+        parents = [positions[id(state.parent)] if state.parent is not None else -1 for state in states]
+        fval_functions = [node.fval_function for node in nodes]
+
+        data = dict((field, getattr(self, field)) for field in _CHECKPOINT_FIELDS)
+        data['version'] = _CHECKPOINT_VERSION
+        data['wall_time'] = self.wall_time
+        data['cpu_time'] = self.cpu_time
+        if self.search_start_time is not None:
+            # the time spent in the search in progress, if any
+            data['wall_time'] = self.wall_time + time.monotonic() - self.search_start_time
+            data['cpu_time'] = self.cpu_time + time.process_time() - self.search_start_cpu
+        data['states'] = states
+        data['parents'] = parents
+        data['path_states'] = [positions[id(state)] for state in self.path_states] \
+            if self.path_states is not None else None
+        data['open'] = self.open.snapshot()
+
+        tmp_path = path + '.tmp'
+        try:
+            for state in states:
+                state.parent = None
+            for node in nodes:
+                node.fval_function = None
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            for state, parent in zip(states, parents):
+                state.parent = states[parent] if parent >= 0 else None
+            for node, fval_function in zip(nodes, fval_functions):
+                node.fval_function = fval_function
+        return True
+
+    def _checkpointSize(self):
+        '''Return the number of nodes on OPEN and states in the cycle check dictionary, which the cost of a
+           checkpoint is taken to be proportional to.'''
+        return len(self.open) + (len(self.cc_dictionary) if self.cc_dictionary is not None else 0)
+
+    def _checkpointAffordable(self, now):
+        '''Return True if a checkpoint taken now would keep the time spent on checkpoints within the overhead
+           allowed by set_checkpoint. Its cost is estimated from the last one's, in proportion to _checkpointSize.'''
+        if self.checkpoint_overhead <= 0 or self.last_checkpoint_cost is None:
+            return True
+        cost, size = self.last_checkpoint_cost
+        estimate = cost * self._checkpointSize() / size if size else cost
+        return self.search_checkpoint_time + estimate <= self.checkpoint_overhead * (now - self.search_start_time)
+
+    def _autoCheckpoint(self):
+        '''Write the checkpoint requested by set_checkpoint and schedule the next one.'''
+        start = time.monotonic()
+        self.checkpoint(self.checkpoint_path)
+        now = time.monotonic()
+        self.checkpoints = self.checkpoints + 1
+        self.checkpoint_time = self.checkpoint_time + now - start
+        self.checkpoint_due = False
+        self.search_checkpoint_time = self.search_checkpoint_time + now - start
+        self.last_checkpoint_cost = (now - start, self._checkpointSize())
+        # the expansion rate measured by _deadline_reached leaves the
+        # checkpoint out.
+        self.last_check_time = now
+        self.next_checkpoint_time = now + self.checkpoint_interval
+
+        # BEGIN TRACING
+        if self.trace:
+            print("   TRACE: Checkpoint {} written to {} in {:.3f} sec".format(self.checkpoints,
+                                                                              self.checkpoint_path, now - start))
+        # END TRACING
+
+    @classmethod
+    def resume(cls, path, goal_fn, heur_fn=_zero_hfn, fval_function=_fval_function):
+        '''
+        Return a SearchEngine continuing the search saved in a checkpoint file (see checkpoint). Call search on it
+        to carry on searching, with the same time and cost bounds as before.
+
+        The heuristic cache, solved table, successor filter, progress callback and checkpoint settings are not
+        saved in the file; set them again on the engine returned if they are wanted.
+
+        @param path: the checkpoint file.
+        @param goal_fn: the goal function the search was started with.
+        @param heur_fn: the heuristic function the search was started with.
+        @param fval_function: the f-value function the search was started with.
+        @return: the SearchEngine, or None if path is not a checkpoint file.
+        '''
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print("Can not read the checkpoint file {}: {}".format(path, e))
+            return None
+        if not isinstance(data, dict) or data.get('version') != _CHECKPOINT_VERSION:
+            print("{} is not a version {} search checkpoint".format(path, _CHECKPOINT_VERSION))
+            return None
+
+        se = cls()
+        se.initStats()
+        for field in _CHECKPOINT_FIELDS:
+            setattr(se, field, data[field])
+        se.wall_time = data['wall_time']
+        se.cpu_time = data['cpu_time']
+
+        states = data['states']
+        for state, parent in zip(states, data['parents']):
+            state.parent = states[parent] if parent >= 0 else None
+        se.path_states = [states[i] for i in data['path_states']] if data['path_states'] is not None else None
+
+        se.goal_fn = goal_fn
+        se.heur_fn = heur_fn
+        se.heur_batch = getattr(heur_fn, 'batch', None)
+        se.fval_function = fval_function
+        se.open = se._newOpen()
+        se.open.restore(data['open'])
+        for node in se.open.nodes():
+            node.fval_function = fval_function
+        return se
+
+    def _deadline_reached(self):
+        '''
+        Called once per expansion by the search routines. Returns True if the time bound has been exceeded.
+
+        The clock is only read every self.check_interval expansions. Each time it is read the interval is
+        rescaled by the expansion rate measured since the previous read, so the clock is read about every
+        _CHECK_PERIOD seconds however expensive expansions are and the time bound is overrun by about that
+        much at most. Progress reports (see set_progress_callback) are made from here too.
+        '''
+        self.check_countdown = self.check_countdown - 1
+        if self.check_countdown > 0:
             return False
 
+        now = time.monotonic()
+        elapsed = now - self.last_check_time
+        if elapsed > 0:
+            interval = int(self.check_interval * _CHECK_PERIOD / elapsed)
+        else:
+            interval = self.check_interval * 2
+        self.check_interval = max(1, min(interval, _MAX_CHECK_INTERVAL))
+        self.check_countdown = self.check_interval
+        self.last_check_time = now
+
+        if self.next_checkpoint_time is not None and now >= self.next_checkpoint_time:
+            self.checkpoint_due = self._checkpointAffordable(now)
+
+        if self.progress_callback is not None and now - self.last_progress_time >= self.progress_interval:
+            self.progress_callback(self._progress(now))
+            self.last_progress_time = now
+            self.last_progress_expanded = self.expanded
+
+        return self.search_stop_time is not None and now > self.search_stop_time
+
+    def _progress(self, now):
+        '''Return the progress report passed to the progress callback, see set_progress_callback.'''
+        if self.strategy == _SMA_STAR:
+            open_size = self.sma_alive
+            best_f = None
+            for fval, _, push, entry in self.sma_open:
+                if entry.alive and entry.push == push:
+                    best_f = fval if best_f is None else min(best_f, fval)
+        elif self.open is None:
+            open_size = None
+            best_f = self.iterations[-1]['threshold'] if self.iterations else None
+        else:
+            open_size = len(self.open)
+            best_f = None
+            if open_size:
+                node = self.open.peek()
+                best_f = node.gval + node.hval
+        since = now - self.last_progress_time
+        return {
+            'elapsed': now - self.search_start_time,
+            'expanded': self.expanded,
+            'generated': self.generated,
+            'nodes_per_sec': (self.expanded - self.last_progress_expanded) / since if since > 0 else 0.,
+            'open_size': open_size,
+            'best_f': best_f,
+            'cc_hit_rate': self.cycle_check_pruned / self.generated if self.generated else 0.,
+        }
+
     def _searchOpen(self, goal_fn, heur_fn, fval_function, costbound):
         """
         Search, starting from self.open.
@@ -418,6 +1606,19 @@ class SearchEngine:
         @param costbound: the cost bound 3-tuple, as described in the assignment.
         """
 
+        # With depth-first search the states on the path to the node being
+        # expanded are kept in path_states (and their hashable states in
+        # path_keys and path_set), so path checking is a set lookup rather
+        # than a walk up the parent chain. Like has_path_cycle, it compares
+        # hashable states even when the state key is canonical.
+        path_states = self.path_states
+        path_keys = self.path_keys
+        path_set = self.path_set
+        state_key = self.state_key
+        successor_filter = self.successor_filter
+        heur_batch = self.heur_batch
+        hvals = None
+
         # BEGIN TRACING
         if self.trace:
             print("   TRACE: Initial OPEN: ", self.open.print_open())
@@ -425,6 +1626,8 @@ class SearchEngine:
                 print("   TRACE: Initial CC_Dict:", self.cc_dictionary)
         # END TRACING
         while not self.open.empty():
+            if self.checkpoint_due:
+                self._autoCheckpoint()
             node = self.open.extract()
 
             # BEGIN TRACING
@@ -436,15 +1639,29 @@ class SearchEngine:
                     print("ERROR: Node gval not equal to state gval!")
             # END TRACING
 
+            # when search is resumed with a tighter cost bound, OPEN can hold
+            # nodes inserted under the old bound.
+            if costbound is not None and (node.gval > costbound[0] or
+                                          node.hval > costbound[1] or
+                                          node.gval + node.hval > costbound[2]):
+                self.cost_bound_pruned = self.cost_bound_pruned + 1
+                continue
+
             if goal_fn(node.state):
                 # node at front of OPEN is a goal...search is completed.
                 return node
 
-            if self.search_stop_time:  # timebound check
-                if os.times()[0] > self.search_stop_time:
-                    # exceeded time bound, must terminate search
-                    print("TRACE: Search has exceeeded the time bound provided.")
-                    return False
+            if self.solved_table is not None and self.strategy == _ASTAR:
+                # with h = h* the rest of a recorded solution path is as
+                # cheap as any other way of completing the search.
+                goal_node = self.solved_table.shortcut(node, goal_fn)
+                if goal_node:
+                    return goal_node
+
+            if self._deadline_reached():  # timebound check
+                # exceeded time bound, must terminate search
+                print("TRACE: Search has exceeeded the time bound provided.")
+                return False
 
             # All states reached by a search node on OPEN have already
             # been hashed into the self.cc_dictionary. However,
@@ -456,13 +1673,28 @@ class SearchEngine:
             # BEGIN TRACING
             if self.trace:
                 if self.cycle_check == _CC_FULL: print("   TRACE: CC_dict gval={}, node.gval={}".format(
-                    self.cc_dictionary[node.state.hashable_state()], node.gval))
+                    self.cc_dictionary[state_key(node.state)], node.gval))
             # END TRACING
 
-            if self.cycle_check == _CC_FULL and self.cc_dictionary[node.state.hashable_state()] < node.gval:
+            if self.cycle_check == _CC_FULL and self.cc_dictionary[state_key(node.state)] < node.gval:
+                self.stale_pruned = self.stale_pruned + 1
                 continue
 
+            if path_states is not None:
+                # the parent of the node is on the current path, so unwind
+                # the path back to it before extending it with the node.
+                parent = node.state.parent
+                while path_states and path_states[-1] is not parent:
+                    path_states.pop()
+                    path_set.discard(path_keys.pop())
+                path_states.append(node.state)
+                path_keys.append(node.state.hashable_state())
+                path_set.add(path_keys[-1])
+
             successors = node.state.successors()
+            self.expanded = self.expanded + 1
+            self.depth_histogram[node.depth] = self.depth_histogram.get(node.depth, 0) + 1
+            self.generated = self.generated + len(successors)
 
             # BEGIN TRACING
             if self.trace:
@@ -473,8 +1705,17 @@ class SearchEngine:
                 print("}")
             # END TRACING
 
+            # successors that pass the successor filter, the cycle checks and
+            # the bound table, which are then evaluated by heur_fn.
+            candidates = []
             for succ in successors:
-                hash_state = succ.hashable_state()
+                if successor_filter is not None and successor_filter(succ):
+                    self.dead_pruned = self.dead_pruned + 1
+                    continue
+                hash_state = state_key(succ)
+                path_cycle = self.cycle_check == _CC_PATH and (
+                    (hash_state if state_key is _hashable_key else succ.hashable_state()) in path_set
+                    if path_states is not None else succ.has_path_cycle())
                 if self.trace > 1:
                     if self.cycle_check == _CC_FULL and hash_state in self.cc_dictionary:
                         print("   TRACE: Already in CC_dict, CC_dict gval={}, successor state gval={}".format(
@@ -490,17 +1731,14 @@ class SearchEngine:
                         print("   TRACE: Already in CC_dict, CC_dict gval={}, successor state gval={}".format(
                             self.cc_dictionary[hash_state], succ.gval))
 
-                    if self.cycle_check == _CC_PATH and succ.has_path_cycle():
+                    if path_cycle:
                         print("   TRACE: On cyclic path")
                 # END TRACING
 
                 prune_succ = (self.cycle_check == _CC_FULL and
                               hash_state in self.cc_dictionary and
                               succ.gval > self.cc_dictionary[hash_state]
-                              ) or (
-                                     self.cycle_check == _CC_PATH and
-                                     succ.has_path_cycle()
-                             )
+                              ) or path_cycle
 
                 if prune_succ:
                     self.cycle_check_pruned = self.cycle_check_pruned + 1
@@ -511,18 +1749,39 @@ class SearchEngine:
                         # END TRACING
                     continue
 
-                succ_hval = heur_fn(succ)
+                if costbound is not None and hash_state in self.bound_table and \
+                        succ.gval >= self.bound_table[hash_state]:
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    if self.trace > 1:
+                        print(" TRACE: Successor State pruned, over current cost bound of {}", costbound)
+                        print("\n")
+                    continue
+
+                candidates.append((succ, hash_state))
+
+            if heur_batch is not None and candidates:
+                # one heuristic call for all the remaining successors
+                hvals = heur_batch([succ for succ, _ in candidates])
+
+            for i, (succ, hash_state) in enumerate(candidates):
+                if self.cycle_check == _CC_FULL and succ.gval > self.cc_dictionary.get(hash_state, succ.gval):
+                    # reached more cheaply by an earlier successor of this node
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    continue
+
+                succ_hval = hvals[i] if hvals is not None else heur_fn(succ)
                 if costbound is not None and (succ.gval > costbound[0] or
                                               succ_hval > costbound[1] or
                                               succ.gval + succ_hval > costbound[2]):
                     self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    self.bound_table[hash_state] = min(succ.gval, self.bound_table.get(hash_state, succ.gval))
                     if self.trace > 1:
                         print(" TRACE: Successor State pruned, over current cost bound of {}", costbound)
                         print("\n")
                     continue
 
                     # passed all cycle checks and costbound checks ...add to open
-                self.open.insert(sNode(succ, succ_hval, node.fval_function))
+                self.open.insert(sNode(succ, succ_hval, node.fval_function, node.depth + 1))
 
                 # BEGIN TRACING
                 if self.trace > 1:
@@ -534,5 +1793,546 @@ class SearchEngine:
                 if self.cycle_check == _CC_FULL:
                     self.cc_dictionary[hash_state] = succ.gval
 
+            if len(self.open) > self.peak_open:
+                self.peak_open = len(self.open)
+
         # end of while--OPEN is empty and no solution
         return False
+
+    def _searchIterative(self, root):
+        """
+        Iterative deepening search (ida_star or iddfs) from the root node.
+        This is a generator: it yields each goal node found, and False
+        when the time bound is exceeded. Calling search again resumes it.
+
+        ida_star bounds each iteration by f = g + h, iddfs by the number
+        of actions on the path. The next threshold is the smallest value
+        that exceeded the current one; the search fails once an iteration
+        prunes nothing by its threshold.
+
+        @param root: the search node of the initial state.
+        """
+        goal_fn = self.goal_fn
+        heur_fn = self.heur_fn
+        successor_filter = self.successor_filter
+        threshold = root.gval + root.hval if self.strategy == _IDA_STAR else 0
+
+        while True:
+            iteration = {'threshold': threshold, 'expanded': 0, 'generated': 0}
+            self.iterations.append(iteration)
+            next_threshold = float("inf")
+
+            # BEGIN TRACING
+            if self.trace:
+                print("   TRACE: Starting iteration with threshold {}".format(threshold))
+            # END TRACING
+
+            # the stack holds the current path, each node paired with an
+            # iterator over its remaining successors (None until expanded).
+            # path_states holds the states of the expanded nodes on the path.
+            stack = [(root, None)]
+            path_states = set()
+            while stack:
+                node, successors = stack[-1]
+
+                if successors is None:
+                    if self.strategy == _IDA_STAR:
+                        bound = node.gval + node.hval
+                    else:
+                        bound = len(stack) - 1
+                    if bound > threshold:
+                        next_threshold = min(next_threshold, bound)
+                        stack.pop()
+                        continue
+
+                    # BEGIN TRACING
+                    if self.trace:
+                        print("   TRACE: Next State to expand: <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(
+                            node.state.index, node.state.action, node.state.hashable_state(), node.gval, node.hval,
+                            node.gval + node.hval))
+                    # END TRACING
+
+                    if goal_fn(node.state):
+                        stack.pop()
+                        yield node
+                        continue
+
+                    if self._deadline_reached():  # timebound check
+                        # exceeded time bound, must terminate search
+                        print("TRACE: Search has exceeeded the time bound provided.")
+                        yield False
+
+                    succs = node.state.successors()
+                    iteration['expanded'] = iteration['expanded'] + 1
+                    iteration['generated'] = iteration['generated'] + len(succs)
+                    self.expanded = self.expanded + 1
+                    self.depth_histogram[node.depth] = self.depth_histogram.get(node.depth, 0) + 1
+                    self.generated = self.generated + len(succs)
+                    if len(stack) > self.peak_open:
+                        self.peak_open = len(stack)
+                    path_states.add(node.state.hashable_state())
+                    stack[-1] = (node, iter(succs))
+                    continue
+
+                succ = next(successors, None)
+                if succ is None:
+                    path_states.discard(node.state.hashable_state())
+                    stack.pop()
+                    continue
+
+                if successor_filter is not None and successor_filter(succ):
+                    self.dead_pruned = self.dead_pruned + 1
+                    continue
+
+                if self.cycle_check == _CC_PATH and succ.hashable_state() in path_states:
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    # BEGIN TRACING
+                    if self.trace > 1:
+                        print(" TRACE: Successor State pruned by cycle checking")
+                    # END TRACING
+                    continue
+
+                succ_hval = heur_fn(succ)
+                costbound = self.costbound
+                if costbound is not None and (succ.gval > costbound[0] or
+                                              succ_hval > costbound[1] or
+                                              succ.gval + succ_hval > costbound[2]):
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    continue
+
+                stack.append((sNode(succ, succ_hval, node.fval_function, node.depth + 1), None))
+
+            if next_threshold == float("inf"):
+                # nothing was cut off by the threshold---search space exhausted
+                return
+            threshold = next_threshold
+
+    def _searchPEA(self, goal_fn, heur_fn, costbound):
+        """
+        Partial Expansion A* (pea_star), starting from self.open.
+
+        Each node on OPEN has a stored f-value F, initially g + h (nodes
+        with another F are kept in self.pea_fvals). When a node is
+        expanded all of its successors are generated and evaluated, but
+        only those with F_prev < g + h <= F are inserted, where F_prev is
+        the node's F at its previous expansion. The others are deferred
+        (counted in self.pea_deferred) and, if there are any, the node
+        goes back on OPEN with F raised to the smallest deferred f-value.
+
+        OPEN then only holds nodes that can be expanded at the current
+        f-value, so pea_star saves OPEN space (and heap operations) only:
+        the smallest deferred f-value is only known once every successor
+        has been evaluated, and a node expanded again regenerates and
+        re-evaluates all of its successors, so it generates more states,
+        and makes more heuristic calls, than astar.
+
+        @param goal_fn: the goal function.
+        @param heur_fn: the heuristic function.
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        frontier = self.open
+        state_key = self.state_key
+        successor_filter = self.successor_filter
+        pea_fvals = self.pea_fvals
+        while not frontier.empty():
+            node = frontier.extract()
+            fval, floor = pea_fvals.pop(node.index, (node.gval + node.hval, float("-inf")))
+
+            # BEGIN TRACING
+            if self.trace:
+                print("   TRACE: Next State to expand: <S{}:{}:{}, g={}, h={}, F={}>".format(
+                    node.state.index, node.state.action, node.state.hashable_state(), node.gval, node.hval,
+                    fval))
+            # END TRACING
+
+            if costbound is not None and (node.gval > costbound[0] or
+                                          node.hval > costbound[1] or
+                                          node.gval + node.hval > costbound[2]):
+                self.cost_bound_pruned = self.cost_bound_pruned + 1
+                continue
+
+            if goal_fn(node.state):
+                return node
+
+            if self._deadline_reached():  # timebound check
+                # exceeded time bound, must terminate search
+                print("TRACE: Search has exceeeded the time bound provided.")
+                return False
+
+            if self.cycle_check == _CC_FULL and self.cc_dictionary[state_key(node.state)] < node.gval:
+                self.stale_pruned = self.stale_pruned + 1
+                continue
+
+            next_fval = float("inf")
+            self.expanded = self.expanded + 1
+            self.depth_histogram[node.depth] = self.depth_histogram.get(node.depth, 0) + 1
+            for succ in node.state.iter_successors():
+                self.generated = self.generated + 1
+                if successor_filter is not None and successor_filter(succ):
+                    self.dead_pruned = self.dead_pruned + 1
+                    continue
+                hash_state = state_key(succ)
+                if (self.cycle_check == _CC_FULL and hash_state in self.cc_dictionary and
+                    succ.gval > self.cc_dictionary[hash_state]) or \
+                        (self.cycle_check == _CC_PATH and succ.has_path_cycle()):
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    continue
+
+                succ_hval = heur_fn(succ)
+                if costbound is not None and (succ.gval > costbound[0] or
+                                              succ_hval > costbound[1] or
+                                              succ.gval + succ_hval > costbound[2]):
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    continue
+
+                succ_fval = succ.gval + succ_hval
+                if succ_fval > fval:
+                    self.pea_deferred = self.pea_deferred + 1
+                    if succ_fval < next_fval:
+                        next_fval = succ_fval
+                    continue
+                if succ_fval <= floor:
+                    # inserted when the node was expanded at a lower F
+                    continue
+
+                frontier.insert(sNode(succ, succ_hval, node.fval_function, node.depth + 1))
+                if self.cycle_check == _CC_FULL:
+                    self.cc_dictionary[hash_state] = succ.gval
+
+            if next_fval != float("inf"):
+                pea_fvals[node.index] = (next_fval, fval)
+                frontier.insert(node)
+
+            if len(frontier) > self.peak_open:
+                self.peak_open = len(frontier)
+
+        return False
+
+    def _searchSMA(self, goal_fn, heur_fn, costbound):
+        """
+        Simplified memory-bounded A* (sma_star), starting from self.sma_open.
+
+        At most self.node_budget nodes are held in memory, counting the
+        expanded nodes on the paths to the nodes on OPEN. When a successor
+        is generated with memory full the worst leaf on OPEN (largest
+        f-value, then shallowest) is evicted, and its f-value is backed up
+        into its parent, which goes back on OPEN (with the smallest
+        f-value of its evicted children) to regenerate it should it become
+        the best node again. f-values never decrease along a path, and a
+        node as deep as memory allows that is not a goal gets an f-value
+        of infinity. With an admissible heuristic the first goal returned
+        is the cheapest one that can be reached within the budget.
+
+        @param goal_fn: the goal function.
+        @param heur_fn: the heuristic function.
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        open_heap = self.sma_open
+        state_key = self.state_key
+        successor_filter = self.successor_filter
+        while open_heap:
+            fval, _, push, entry = heapq.heappop(open_heap)
+            if not entry.alive or entry.push != push:
+                continue
+            entry.on_open = False
+            self.sma_on_open = self.sma_on_open - 1
+            node = entry.node
+
+            # BEGIN TRACING
+            if self.trace:
+                print("   TRACE: Next State to expand: <S{}:{}:{}, g={}, h={}, f={}>".format(
+                    node.state.index, node.state.action, node.state.hashable_state(), node.gval, node.hval, fval))
+            # END TRACING
+
+            if fval == float("inf"):
+                # no goal can be reached within the node budget
+                self._smaPush(entry)
+                return False
+
+            if costbound is not None and (node.gval > costbound[0] or
+                                          node.hval > costbound[1] or
+                                          node.gval + node.hval > costbound[2]):
+                self.cost_bound_pruned = self.cost_bound_pruned + 1
+                self._smaRemove(entry)
+                continue
+
+            if goal_fn(node.state):
+                return node
+
+            if self._deadline_reached():  # timebound check
+                # exceeded time bound, must terminate search
+                print("TRACE: Search has exceeeded the time bound provided.")
+                self._smaPush(entry)
+                return False
+
+            self.expanded = self.expanded + 1
+            self.depth_histogram[node.depth] = self.depth_histogram.get(node.depth, 0) + 1
+            # the evicted children are about to be regenerated
+            entry.forgotten = float("inf")
+            depth = node.depth + 1
+            for succ in node.state.iter_successors():
+                self.generated = self.generated + 1
+                if successor_filter is not None and successor_filter(succ):
+                    self.dead_pruned = self.dead_pruned + 1
+                    continue
+                hash_state = state_key(succ)
+                if hash_state in entry.children:
+                    # still in memory from an earlier expansion
+                    continue
+                if self.cycle_check == _CC_PATH and succ.has_path_cycle():
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    continue
+
+                succ_hval = heur_fn(succ)
+                if costbound is not None and (succ.gval > costbound[0] or
+                                              succ_hval > costbound[1] or
+                                              succ.gval + succ_hval > costbound[2]):
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    continue
+
+                succ_fval = max(entry.fval, succ.gval + succ_hval)
+                if depth >= self.node_budget - 1 and not goal_fn(succ):
+                    succ_fval = float("inf")
+
+                if self.sma_alive >= self.node_budget and not self._smaEvict():
+                    # nothing can be evicted: forget the successor instead
+                    entry.forgotten = min(entry.forgotten, succ_fval)
+                    continue
+
+                child = _SMAEntry(sNode(succ, succ_hval, node.fval_function, depth), hash_state, entry, succ_fval)
+                entry.children[hash_state] = child
+                self.sma_alive = self.sma_alive + 1
+                self._smaPush(child)
+
+            if self.sma_alive > self.budget_used:
+                self.budget_used = self.sma_alive
+            if self.sma_on_open > self.peak_open:
+                self.peak_open = self.sma_on_open
+
+            if entry.forgotten < float("inf"):
+                if not entry.on_open or entry.forgotten < entry.fval:
+                    entry.fval = entry.forgotten
+                    self._smaPush(entry)
+            elif not entry.children:
+                # a dead end
+                self._smaRemove(entry)
+
+        return False
+
+    def _smaPush(self, entry):
+        '''Put an sma_star entry on OPEN, and on the heap of leaves if it has no children in memory.'''
+        self.sma_pushes = self.sma_pushes + 1
+        entry.push = self.sma_pushes
+        if not entry.on_open:
+            entry.on_open = True
+            self.sma_on_open = self.sma_on_open + 1
+        heapq.heappush(self.sma_open, (entry.fval, -entry.node.depth, entry.push, entry))
+        if not entry.children:
+            heapq.heappush(self.sma_leaves, (-entry.fval, entry.node.depth, entry.push, entry))
+
+    def _smaEvict(self):
+        '''Evict the worst leaf on OPEN, backing its f-value up into its parent. Returns False if there is none.'''
+        leaves = self.sma_leaves
+        while leaves:
+            _, _, push, leaf = heapq.heappop(leaves)
+            if not leaf.alive or not leaf.on_open or leaf.push != push or leaf.children or leaf.parent is None:
+                continue
+            leaf.alive = False
+            self.sma_alive = self.sma_alive - 1
+            self.sma_on_open = self.sma_on_open - 1
+            self.evicted = self.evicted + 1
+            parent = leaf.parent
+            del parent.children[leaf.key]
+            if leaf.fval < parent.forgotten:
+                parent.forgotten = leaf.fval
+            if not parent.on_open or parent.forgotten < parent.fval:
+                parent.fval = parent.forgotten
+                self._smaPush(parent)
+            elif not parent.children:
+                # already on OPEN, but now a leaf that can be evicted
+                heapq.heappush(leaves, (-parent.fval, parent.node.depth, parent.push, parent))
+            return True
+        return False
+
+    def _smaRemove(self, entry):
+        '''Remove an sma_star entry that cannot lead to a goal, and any ancestors that are left with nothing to
+           expand.'''
+        while entry is not None:
+            entry.alive = False
+            self.sma_alive = self.sma_alive - 1
+            parent = entry.parent
+            if parent is None:
+                return
+            del parent.children[entry.key]
+            if parent.children:
+                return
+            if parent.on_open:
+                # now a leaf that can be evicted
+                heapq.heappush(self.sma_leaves, (-parent.fval, parent.node.depth, parent.push, parent))
+                return
+            if parent.forgotten < float("inf"):
+                parent.fval = parent.forgotten
+                self._smaPush(parent)
+                return
+            entry = parent
+
+    def _searchARA(self, goal_fn, heur_fn, costbound):
+        """
+        Anytime Repairing A* (ara_star), starting from self.open.
+
+        Each round is a weighted A* search ordered by g + weight * h that
+        ends once the incumbent (best goal found so far) costs no more
+        than the smallest key on OPEN. Between rounds the weight is
+        lowered by self.weight_step, the INCONS nodes (closed states that
+        were reached again more cheaply) are moved back onto OPEN and OPEN
+        is re-keyed. Nodes that cannot lead to a goal cheaper than the
+        incumbent, i.e. g >= incumbent cost, are pruned, or g + h >=
+        incumbent cost if the heuristic is declared admissible (see
+        set_admissible_heuristic). Each new incumbent is recorded in
+        self.improvements together with its suboptimality bound, which
+        is only exact for an admissible heuristic.
+
+        In the round at weight 1 closed states that are reached again more
+        cheaply go back on OPEN rather than to INCONS, as there is no later
+        round to expand them. Without an admissible heuristic a node whose
+        key exceeds the incumbent's cost may still lead to a cheaper goal,
+        so that round also carries on past each goal it finds and runs
+        until OPEN is empty.
+
+        Returns the incumbent when the round at weight 1 completes or
+        the time bound is exceeded, or False if no goal was found.
+
+        @param goal_fn: the goal function.
+        @param heur_fn: the heuristic function.
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        while True:
+            done = self._improvePath(goal_fn, heur_fn, costbound)
+            if done or self.weight <= 1.:
+                return self.incumbent if self.incumbent else False
+
+            self.weight = max(self.weight - self.weight_step, 1.)
+
+            # BEGIN TRACING
+            if self.trace:
+                print("   TRACE: Lowering weight to {}".format(self.weight))
+            # END TRACING
+
+            nodes = self.open.nodes() + list(self.incons.values())
+            self.open = Open(self.strategy, weight=self.weight)
+            for node in nodes:
+                if self.cc_dictionary[self.state_key(node.state)] < node.gval:
+                    self.stale_pruned = self.stale_pruned + 1
+                elif self.incumbent and self._incumbentPrunes(node):
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                else:
+                    self.open.insert(node)
+            self.incons = dict()
+            self.closed = set()
+
+    def _improvePath(self, goal_fn, heur_fn, costbound):
+        """
+        Run one ara_star round at the current weight. Returns True if the
+        search should stop (time bound exceeded), False otherwise.
+        """
+        frontier = self.open
+        cc_dictionary = self.cc_dictionary
+        state_key = self.state_key
+        successor_filter = self.successor_filter
+        # the last round reopens closed states, and only ends early if h is
+        # admissible, see _searchARA
+        last_round = self.weight <= 1.
+        round_ends = self.admissible or not last_round
+        while not frontier.empty():
+            node = frontier.extract()
+
+            incumbent = self.incumbent
+            if round_ends and incumbent and incumbent.gval <= node.gval + self.weight * node.hval:
+                # no node on OPEN can improve on the incumbent at this weight
+                frontier.insert(node)
+                return False
+
+            hash_state = state_key(node.state)
+            if cc_dictionary[hash_state] < node.gval:
+                self.stale_pruned = self.stale_pruned + 1
+                continue
+            if incumbent and self._incumbentPrunes(node):
+                self.cost_bound_pruned = self.cost_bound_pruned + 1
+                continue
+
+            # BEGIN TRACING
+            if self.trace:
+                print("   TRACE: Next State to expand: <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(
+                    node.state.index, node.state.action, hash_state, node.gval, node.hval,
+                    node.gval + node.hval))
+            # END TRACING
+
+            if goal_fn(node.state):
+                self.incumbent = node
+                self._recordImprovement(node)
+                if round_ends:
+                    return False
+                continue
+
+            if self._deadline_reached():  # timebound check
+                # exceeded time bound, must terminate search
+                print("TRACE: Search has exceeeded the time bound provided.")
+                return True
+
+            self.closed.add(hash_state)
+            successors = node.state.successors()
+            self.expanded = self.expanded + 1
+            self.depth_histogram[node.depth] = self.depth_histogram.get(node.depth, 0) + 1
+            self.generated = self.generated + len(successors)
+            for succ in successors:
+                if successor_filter is not None and successor_filter(succ):
+                    self.dead_pruned = self.dead_pruned + 1
+                    continue
+                hash_state = state_key(succ)
+                if hash_state in cc_dictionary and succ.gval >= cc_dictionary[hash_state]:
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    continue
+
+                succ_hval = heur_fn(succ)
+                if costbound is not None and (succ.gval > costbound[0] or
+                                              succ_hval > costbound[1] or
+                                              succ.gval + succ_hval > costbound[2]):
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    continue
+
+                cc_dictionary[hash_state] = succ.gval
+                succ_node = sNode(succ, succ_hval, node.fval_function, node.depth + 1)
+                if hash_state in self.closed and not last_round:
+                    self.incons[hash_state] = succ_node
+                else:
+                    frontier.insert(succ_node)
+
+            if len(frontier) + len(self.incons) > self.peak_open:
+                self.peak_open = len(frontier) + len(self.incons)
+        return False
+
+    def _incumbentPrunes(self, node):
+        '''Return True if ara_star can not reach a goal cheaper than its incumbent through node.'''
+        if self.admissible:
+            return node.gval + node.hval >= self.incumbent.gval
+        return node.gval >= self.incumbent.gval
+
+    def _recordImprovement(self, goal_node):
+        '''Record a new ara_star incumbent with its suboptimality bound:
+           the incumbent costs at most bound times the optimal cost.'''
+        fmin = min([nd.gval + nd.hval for nd in self.open.nodes() + list(self.incons.values())
+                    if self.cc_dictionary[self.state_key(nd.state)] >= nd.gval], default=None)
+        if fmin is None or fmin >= goal_node.gval:
+            bound = 1.
+        elif fmin <= 0:
+            bound = self.weight
+        else:
+            bound = min(self.weight, goal_node.gval / fmin)
+        self.improvements.append({'cost': goal_node.gval, 'weight': self.weight, 'bound': bound,
+                                  'time': time.monotonic() - self.search_start_time})
+
+        # BEGIN TRACING
+        if self.trace:
+            print("   TRACE: Solution of cost {} found at weight {}, suboptimality bound {}".format(
+                goal_node.gval, self.weight, bound))
+        # END TRACING
@@ -7,9 +7,14 @@
 #   You may not import or otherwise source any of your own files
 
 # import os for time functions
+import time
+try:
+    import numpy  # for the batch heuristics
+except ImportError:  # they fall back to pure python
+    numpy = None
 from search import *  # for search engines
 from lunarlockout import LunarLockoutState, Direction, \
-    lockout_goal_state  # for LunarLockout specific classes and problems
+    lockout_goal_state, lockout_dead_state  # for LunarLockout specific classes and problems
 
 
 # LunarLockout HEURISTICS
@@ -52,6 +57,34 @@ def heur_L_distance(state):
     return result
 
 
+def _xanadu_offsets(states):
+    '''Return a numpy array of the xanadus' coordinates minus the center for each of a list of states on the same
+       board, with shape (states, xanadus, 2).'''
+    center = int((states[0].width - 1) / 2)
+    return numpy.array([state.xanadus for state in states]) - center
+
+
+def heur_manhattan_distance_batch(states):
+    '''heur_manhattan_distance of each of a list of states, see SearchEngine.init_search'''
+    if numpy is None or not states:
+        return [heur_manhattan_distance(state) for state in states]
+    return numpy.abs(_xanadu_offsets(states)).sum(axis=(1, 2)).tolist()
+
+
+def heur_L_distance_batch(states):
+    '''heur_L_distance of each of a list of states, see SearchEngine.init_search'''
+    if numpy is None or not states:
+        return [heur_L_distance(state) for state in states]
+    return (_xanadu_offsets(states) != 0).sum(axis=(1, 2)).tolist()
+
+
+# The batch forms are not attached to the heuristics by default: a node
+# has only about ten successors left to evaluate once cycle checking is
+# done, and building an array for so few states costs more than the one
+# call saves. To try them, set e.g.
+#     heur_L_distance.batch = heur_L_distance_batch
+
+
 def check_dead_corner(xanadu, other_objs):
     """
     Check whether the xanadu is position at the dead corner which it can never escape
@@ -192,22 +225,17 @@ def anytime_weighted_astar(initial_state, heur_fn, weight=4., timebound=2):
     '''INPUT: a lunar lockout state that represents the start state and a timebound (number of seconds)'''
     '''OUTPUT: A goal state (if a goal is found), else False'''
     '''implementation of weighted astar algorithm'''
-    se = SearchEngine("custom", "full")
-    solution = False
-    while weight > 1 and timebound > 0:
-        wrapped_fval_function = (lambda sN: fval_function(sN, weight))
-        se.init_search(initial_state, lockout_goal_state, heur_fn, wrapped_fval_function)
-
-        start_time = os.times()[0]
-        result = se.search(timebound)
-        end_time = os.times()[0]
-
-        if result:
-            solution = result
-
-        timebound -= end_time - start_time
-        weight -= 1
-    return solution
+    # ara_star orders OPEN by g + weight * h, the same f-value as fval_function, lowering the weight by one
+    # after each solution. Unlike restarting a custom search for each weight it keeps OPEN, the cycle check
+    # dictionary and the computed heuristic values between weights. States reached again at a lower weight
+    # take their heuristic value from the heuristic cache. Successors from which the center is provably
+    # unreachable are dropped before they are evaluated. heur_fn need not be admissible (heur_alternate is
+    # not), so the incumbent only prunes nodes by their g-value, see SearchEngine.set_admissible_heuristic.
+    se = SearchEngine("ara_star", "full")
+    se.set_heuristic_cache(100000)
+    se.set_successor_filter(lockout_dead_state)
+    se.init_search(initial_state, lockout_goal_state, heur_fn, weight=weight, weight_step=1.)
+    return se.search(timebound)
 
 
 def anytime_gbfs(initial_state, heur_fn, timebound=2):
@@ -217,7 +245,26 @@ def anytime_gbfs(initial_state, heur_fn, timebound=2):
     '''is used to set the cost bound for the next iteration.  Only paths within the cost bound are considered at each iteration.'''
     '''INPUT: a lunar lockout state that represents the start state and a timebound (number of seconds)'''
     '''OUTPUT: A goal state (if a goal is found), else False'''
-    return 0
+    # The search is initialised once and resumed with a tighter cost bound after each solution, so the frontier,
+    # the cycle check dictionary and the table of states pruned by the bound are kept between iterations.
+    se = SearchEngine("best_first", "full")
+    se.set_successor_filter(lockout_dead_state)
+    se.init_search(initial_state, lockout_goal_state, heur_fn)
+    solution = False
+    costbound = None
+    while timebound > 0:
+        start_time = time.monotonic()
+        result = se.search(timebound, costbound)
+        end_time = time.monotonic()
+
+        if not result:
+            # frontier exhausted within the cost bound, or out of time
+            break
+        solution = result
+        costbound = (solution.gval - 1, float("inf"), float("inf"))
+
+        timebound -= end_time - start_time
+    return solution
 
 
 PROBLEMS = (